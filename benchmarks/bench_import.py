@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Time importing a large .bib file with the entries parsed in 1 to 16
+processes, and check that every number of processes gives the same Articles.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, multiprocessing, os, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from bibtex.bibtexfile import BibtexFile
+
+from generate import generate_library
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Time importing a .bib file in several processes")
+    parser.add_argument("bib_file", type=str, nargs='?', default=None,
+                        help="The .bib file to import (default: generate one"
+                             " of --entries entries)")
+    parser.add_argument("--entries", type=int, default=100000,
+                        help="The number of entries to generate"
+                             " (default: 100000)")
+    parser.add_argument("--processes", type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16],
+                        help="The numbers of processes to time"
+                             " (default: 1 2 4 8 16)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = args.bib_file
+        if path is None:
+            path = os.path.join(directory, 'library.bib')
+            generate_library(path, args.entries)
+        # Time parsing the file, not loading a snapshot of it
+        BibtexFile.snapshot_dir = None
+
+        print("{0}, {1} CPUs".format(path, multiprocessing.cpu_count()))
+        serial = None
+        failed = False
+        for processes in args.processes:
+            BibtexFile.processes = processes
+            start = time.time()
+            bib_file = BibtexFile(path)
+            seconds = time.time() - start
+            articles = [article.__dict__ for article in bib_file.articles]
+            if serial is None:
+                serial = (seconds, articles)
+            same = articles == serial[1]
+            failed = failed or not same
+            print("{0:3d} processes: {1} entries in {2:.2f} s, speed up"
+                  " {3:.2f}{4}".format(processes, len(articles), seconds,
+                                       serial[0] / seconds,
+                                       '' if same else ', NOT THE SAME'))
+    finally:
+        shutil.rmtree(directory)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Time finding the identifier in the first page text of pdfs, and check the
+identifiers found against those expected for the fixture pages.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, glob, io, json, os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from bibtex.scanner import identify
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'fixtures', 'first_pages')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Time the identifier scanner on first page texts")
+    parser.add_argument("directory", type=str, nargs='?', default=FIXTURES,
+                        help="Directory of first page texts (*.txt), and"
+                             " optionally expected.json (default: fixtures)")
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="Number of times to scan each page"
+                             " (default: 200)")
+    args = parser.parse_args()
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(args.directory, '*.txt'))):
+        with io.open(path, encoding='utf-8', errors='replace') as page:
+            pages[os.path.basename(path)] = page.readlines()
+    if not pages:
+        sys.exit("No *.txt pages in {0}".format(args.directory))
+
+    expected = None
+    expected_path = os.path.join(args.directory, 'expected.json')
+    if os.path.exists(expected_path):
+        with io.open(expected_path, encoding='utf-8') as expected_file:
+            expected = json.load(expected_file)
+
+    correct = 0
+    for name, pdf_txt in sorted(pages.items()):
+        found = identify('paper.pdf', pdf_txt)
+        if expected is None or name not in expected:
+            continue
+        if (list(found) if found else None) == expected[name]:
+            correct += 1
+        else:
+            print("{0}: found {1}, expected {2}".format(name, found,
+                                                         expected[name]))
+
+    seconds = timeit.timeit(lambda: [identify('paper.pdf', pdf_txt)
+                                     for pdf_txt in pages.values()],
+                            number=args.repeat)
+    print("{0} pages, {1:.1f} us per page".format(
+                    len(pages), 1e6 * seconds / (args.repeat * len(pages))))
+    if expected is not None:
+        print("{0}/{1} identifiers as expected".format(correct, len(expected)))
+        if correct != len(expected):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
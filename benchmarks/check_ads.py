@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Check how pdftobib uses ADS, running it on generated pdfs against a local
+fake ADS mirror: a second run is answered from the cache without any
+request, --offline adds every pdf from the cache, and an empty response is
+not cached. Also check the ADS client against fake mirrors with injected
+latency and errors: it prefers the fastest mirror, fails over from a mirror
+that errors, retries a dropped kept-alive connection at once, and keeps a
+bounded history.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, os, random, shutil, subprocess, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, ROOT)
+from bibtex.ads import ADSClient
+from bibtex.bibtexfile import BibtexFile
+
+from fake_ads import FakeADS
+from generate import generate_pdfs
+
+
+def run_pdftobib(directory, pdfs, mirror, options=()):
+    """
+    Run pdftobib on newly generated pdfs, adding them to a new .bib file
+
+    Parameters
+    ----------
+    directory : string
+        The directory to work in, the ADS cache is kept in its 'cache'
+        directory between runs
+    pdfs : int
+        The number of pdfs to generate
+    mirror : string
+        The ADS mirror to query
+    options : list of strings, optional
+        Other options to give pdftobib
+
+    Returns
+    -------
+    int
+        The number of entries in the .bib file written
+    """
+    pdf_directory = os.path.join(directory, 'pdfs')
+    bib_path = os.path.join(directory, 'articles.bib')
+    shutil.rmtree(pdf_directory, ignore_errors=True)
+    os.mkdir(pdf_directory)
+    if os.path.exists(bib_path):
+        os.remove(bib_path)
+    generate_pdfs(pdf_directory, pdfs)
+    command = ([sys.executable, os.path.join(ROOT, 'bin', 'pdftobib'),
+                pdf_directory + '/', bib_path, '--ads-mirror', mirror,
+                '--no-manifest'] + list(options))
+    environment = dict(os.environ, PYTHONPATH=ROOT,
+                       XDG_CACHE_HOME=os.path.join(directory, 'cache'))
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(command, env=environment, stdout=devnull)
+    if not os.path.exists(bib_path):
+        return 0
+    return len(BibtexFile(bib_path, lazy=True).articles)
+
+
+def check_cache(directory, pdfs):
+    """
+    Check that ADS responses are cached, and only once they parse
+
+    Returns
+    -------
+    list of strings
+        A description of each check that failed
+    """
+    failures = []
+    expect = _expecter(failures)
+    ads = FakeADS().start()
+    try:
+        # The second generated pdf has this DOI, which ADS does not know at
+        # first
+        ads.missing.add('10.1088/0004-637x/700/1/1')
+        entries = run_pdftobib(directory, pdfs, ads.mirror)
+        expect('Entries added with one DOI unknown', entries, pdfs - 1)
+        ads.missing.clear()
+        requests = ads.requests
+        entries = run_pdftobib(directory, pdfs, ads.mirror)
+        expect('Entries added once the DOI is known', entries, pdfs)
+        expect('Requests for the DOI whose empty response was not cached',
+               ads.requests - requests, 1)
+        requests = ads.requests
+        entries = run_pdftobib(directory, pdfs, ads.mirror)
+        expect('Entries added from the cache', entries, pdfs)
+        expect('Requests when every response is cached',
+               ads.requests - requests, 0)
+    finally:
+        ads.stop()
+    # The mirror no longer answers, so only the cache can be used
+    entries = run_pdftobib(directory, pdfs, ads.mirror, ['--offline'])
+    expect('Entries added with --offline', entries, pdfs)
+    return failures
+
+
+def check_client(requests):
+    """
+    Check that the ADS client handles slow and failing mirrors, and dropped
+    connections
+
+    Parameters
+    ----------
+    requests : int
+        The number of requests to make to find the fastest mirror
+
+    Returns
+    -------
+    list of strings
+        A description of each check that failed
+    """
+    failures = []
+    expect = _expecter(failures)
+    url = ('http://adsabs.harvard.edu/cgi-bin/nph-bib_query'
+           '?bibcode=2001ApJ...500..100A')
+    random.seed(1)
+    slow = FakeADS(delay=0.02).start()
+    fast = FakeADS().start()
+    try:
+        # The slow mirror is ranked first until the fast one is explored
+        client = ADSClient([slow.mirror, fast.mirror], backoff=1.,
+                           history_size=10)
+        for request in range(requests):
+            client.get(url)
+        expect('Fastest mirror', client.ranked_mirrors()[0], fast.mirror)
+        expect('Requests to the fast mirror more than to the slow',
+               fast.requests > slow.requests, True)
+        expect('Requests counted', client.requests, requests)
+        expect('Requests kept in history', len(client.history), 10)
+
+        # A kept-alive connection closed by the mirror is not a failure
+        client.explore = 0.
+        fast.server.drops = 1
+        start = time.time()
+        client.get(url)
+        expect('Retries after a dropped connection', client.history[-1][2],
+               0)
+        expect('Mirror answering after a dropped connection',
+               client.history[-1][0], fast.mirror)
+        expect('Dropped connection retried without backoff',
+               time.time() - start < 0.5, True)
+        expect('Connections dropped', fast.server.drops, 0)
+
+        # The fast mirror fails, so the request fails over after a backoff
+        fast.server.failures = 1
+        client.get(url)
+        expect('Retries after a 503', client.history[-1][2], 1)
+        expect('Retries counted', client.retried, 1)
+        expect('Mirror answering after a 503', client.history[-1][0],
+               slow.mirror)
+    finally:
+        slow.stop()
+        fast.stop()
+    return failures
+
+
+def _expecter(failures):
+    """
+    Get a function that checks a value, adding a description of the check to
+    failures if it is not as expected
+    """
+    def expect(description, value, expected):
+        if value != expected:
+            failures.append('{0}: {1}, expected {2}'.format(description,
+                                                            value, expected))
+    return expect
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--pdfs", type=int, default=12,
+                        help="The number of pdfs to generate (default: 12)"
+                        )
+    parser.add_argument("--requests", type=int, default=200,
+                        help="The number of requests made to find the fastest"
+                             " of two mirrors (default: 200)"
+                        )
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bibtex-check-')
+    try:
+        failures = (check_cache(directory, args.pdfs) +
+                    check_client(args.requests))
+    finally:
+        shutil.rmtree(directory)
+    for failure in failures:
+        print("*** {0}".format(failure))
+    if failures:
+        sys.exit(1)
+    print("All checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Check that _parse_bibtex_entry gives the same result as the parser it
+replaced, on generated entries in the format of ADS and on entries with
+random values of braces, quotes and commas.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, os, random, re, sys
+from string import whitespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, ROOT)
+from bibtex.entry import _parse_bibtex_entry
+
+from generate import library_entries
+
+
+# Characters of the random values
+_VALUE_CHARACTERS = '{}"a ,'
+
+
+def baseline_parse_bibtex_entry(bib_list):
+    """
+    The parser replaced by the linear time stripping of value delimiters,
+    kept unchanged to compare with
+    """
+    bib_dict = {}
+    last_key = None
+    for line in bib_list:
+        line_list = line.split()
+        try:
+            if line_list[1] == '=':  # If the start of key = value pair
+                bib_dict[line_list[0]] = line_list[2:]
+                last_key = line_list[0]
+            else:
+                raise IndexError
+        except IndexError:  # If not the start of a key = value pair
+            if line[0] == '@':
+                # Determine bibtex entry definition line properties
+                bib_dict['type'] = [
+                        re.search(r'(?<=@)'  # preceded by @
+                                  r'.*'      # matches anything
+                                  r'(?={)',  # followed by {
+                                  line
+                                  ).group().lower()
+                                    ]
+                bib_dict['reference'] = [
+                        re.search(r'(?<={)'  # preceded by {
+                                  r'.*'      # matches anything
+                                  r'(?=,)' ,  # followed by ,
+                                  line
+                                  ).group()
+                                         ]
+            else:
+                # Add line to value of last defined key
+                bib_dict[last_key] += line_list
+    # Remove last } of entry
+    bib_dict[last_key] = ''.join( \
+                ' '.join(bib_dict[last_key]).rsplit('}', 1)).split()
+
+    # All bibtex keys are now dictionary keys
+    # Need to remove { " , from beginning/end of bib_dict values
+    for key in bib_dict:
+        bib_dict[key] = ' '.join(bib_dict[key])
+        if bib_dict[key][-1] == ',':
+            bib_dict[key] = bib_dict[key][:-1]
+        while True:
+            count = 0
+            len_greater_than_0 = 0
+            for character in bib_dict[key]:
+                if count > 0:
+                    len_greater_than_0 += 1
+                if character == '{':
+                    count += 1
+                elif character == '}':
+                    count -= 1
+            try:
+                if ((bib_dict[key][0] == '"' and bib_dict[key][-1] == '"')
+                        or
+                        len_greater_than_0 == (len(bib_dict[key]) - 1)    ):
+                    bib_dict[key] = bib_dict[key][1:-1]
+                else:
+                    raise IndexError
+            except IndexError:
+                break
+
+    # Now parse authors into a tuple of tuples
+    # This is hardcoded for ADS braces format
+    authors = []
+    # Authors separated by ' and '
+    # Example author: {Ivezi{\'c}}, {\v Z}.~R.
+    for author in bib_dict['author'].split(' and '):
+        if author == '\n':
+            continue
+        try:
+            name = [re.search(r'(?<=\{).+(?=\},)', author).group(0)]
+            initials = re.search(r'(?<=\},).*', author).group(0).split('.')
+            for initial in initials:
+                stripped = initial.strip('~' + whitespace)
+                if stripped != '':
+                    name.append(stripped)
+        except AttributeError:
+            try:
+                name = [re.search(r'(?<=\{).+(?=\})', author).group(0)]
+            except AttributeError:  # likely et al.
+                name = [author]
+        authors.append(tuple(name))
+    bib_dict['author'] = tuple(authors)
+
+    return bib_dict
+
+
+def random_entries(count, seed=1):
+    """
+    Generate entries with a title of random braces, quotes, commas, spaces
+    and letters, sometimes split over two lines
+
+    Yields
+    ------
+    list of strings
+        The lines of each entry
+    """
+    generator = random.Random(seed)
+    for number in range(count):
+        value = ''.join(generator.choice(_VALUE_CHARACTERS)
+                        for character in range(generator.randint(0, 8)))
+        title = ['  title = ' + value + ',\n']
+        split = value.find(' ')
+        if split > 0 and generator.random() < 0.3:
+            title = ['  title = ' + value[:split] + '\n',
+                     '    ' + value[split + 1:] + ',\n']
+        yield (['@ARTICLE{2001ApJ...500..100A,\n',
+                '  author = {{Adams}, B.},\n'] + title +
+               ['  year = 2001\n', '}\n'])
+
+
+def parse(parser, entry):
+    """
+    Parse an entry, returning the error raised, as (error type name,) if it
+    cannot be parsed
+    """
+    try:
+        return parser(entry)
+    except Exception as error:
+        return (type(error).__name__,)
+
+
+def compare(entries):
+    """
+    Parse entries with _parse_bibtex_entry and the baseline parser
+
+    Returns
+    -------
+    tuple: 2 elements, (int, list of tuples)
+        The number of entries compared, and (entry, result, baseline result)
+        for each that differs
+    """
+    compared = 0
+    differences = []
+    for entry in entries:
+        compared += 1
+        result = parse(_parse_bibtex_entry, entry)
+        baseline = parse(baseline_parse_bibtex_entry, entry)
+        if result != baseline:
+            differences.append((entry, result, baseline))
+    return compared, differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--entries", type=int, default=20000,
+                        help="The number of generated entries in the format"
+                             " of ADS (default: 20000)"
+                        )
+    parser.add_argument("--values", type=int, default=200000,
+                        help="The number of entries with random values"
+                             " (default: 200000)"
+                        )
+    parser.add_argument("--seed", type=int, default=1,
+                        help="The seed of the random entries (default: 1)"
+                        )
+    args = parser.parse_args()
+
+    failed = False
+    for name, entries in [
+            ('generated', (lines for reference, lines
+                           in library_entries(args.entries, args.seed))),
+            ('random values', random_entries(args.values, args.seed))]:
+        compared, differences = compare(entries)
+        print("{0}: {1} entries, {2} differences".format(name, compared,
+                                                         len(differences)))
+        for entry, result, baseline in differences[:5]:
+            print("*** {0!r}\n    gives {1!r}\n    not {2!r}".format(
+                                        ''.join(entry), result, baseline))
+        failed = failed or bool(differences)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
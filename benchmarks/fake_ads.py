@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+A local HTTP server that answers ADS bibtex queries (nph-bib_query) with
+generated entries, so that pdftobib can be benchmarked without the network.
+
+The entry for a bibcode or DOI is always the same, and a bibcode missing its
+author initial (as requested for arXiv identifiers) gets one. Latency, server
+errors and dropped kept-alive connections can be injected to check how
+clients handle them.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, random, threading, time
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlsplit
+
+from generate import INITIALS, JOURNALS, bibcode, entry_lines
+
+
+# The header ADS puts before the entries, 5 lines
+_HEADER = ('Query Results from the ADS Database\n\n'
+           'Retrieved {0} abstracts, starting with number 1.\n'
+           'Total number selected: {0}.\n\n')
+
+
+class FakeADS(object):
+
+    def __init__(self, port=0, delay=0.):
+        """
+        A fake ADS mirror, serving from a thread until stopped
+
+        Parameters
+        ----------
+        port : int, optional
+            The port to listen on (default: 0 = any free port)
+        delay : float, optional
+            The time taken to answer each request, in seconds (default: 0)
+        """
+        self.server = _Server(('127.0.0.1', port), _Handler)
+        # These can be changed while serving
+        self.server.delay = delay
+        # The number of the next requests to answer with 503 Service
+        # Unavailable
+        self.server.failures = 0
+        # The number of the next requests on a kept-alive connection to
+        # answer by closing the connection, as a server does when it has
+        # timed out an idle connection
+        self.server.drops = 0
+        self.server.requests = 0
+        # Lower case bibcodes and DOIs to answer with no entry, as ADS does
+        # for an identifier it does not know (can be changed while serving)
+        self.missing = self.server.missing = set()
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+
+
+    @property
+    def requests(self):
+        """
+        The number of requests answered
+        """
+        return self.server.requests
+
+
+    @property
+    def mirror(self):
+        """
+        The mirror to give pdftobib eg '127.0.0.1:8765'
+        """
+        return '{0}:{1}'.format(*self.server.server_address[:2])
+
+
+    def start(self):
+        """
+        Start serving requests
+        """
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        """
+        Stop serving requests
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write (flushed after each request), not the
+    # status line and headers separately, which delayed acknowledgements
+    # slow down on a kept-alive connection
+    wbufsize = -1
+
+    def do_GET(self):
+        """
+        Answer a query for one or more bibcodes, or a DOI
+        """
+        # A handler answers every request on one connection
+        kept_alive = getattr(self, 'answered', False)
+        self.answered = True
+        if kept_alive and self.server.drops > 0:
+            self.server.drops -= 1
+            self.close_connection = True
+            return
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        if self.server.failures > 0:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        entries = ([_entry(code) for code in query.get('bibcode', [])
+                    if code.lower() not in self.server.missing] +
+                   [_entry(doi, doi=True) for doi in query.get('doi', [])
+                    if doi.lower() not in self.server.missing])
+        body = (_HEADER.format(len(entries)) +
+                ''.join(''.join(entry) for entry in entries)
+                ).encode('iso-8859-1')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        """
+        Do not log requests
+        """
+        pass
+
+
+def _entry(identifier, doi=False):
+    """
+    Generate the entry for a bibcode or DOI, the same for every request
+
+    Returns
+    -------
+    list of strings
+        The lines of the entry
+    """
+    generator = random.Random(identifier)
+    if doi:
+        journal_macro, journal = generator.choice(JOURNALS[:-1])
+        reference = bibcode(generator.randint(1990, 2016), journal,
+                            generator.randint(100, 999),
+                            generator.randint(1, 9999),
+                            generator.choice(INITIALS))
+        return entry_lines(generator, reference, int(reference[:4]),
+                           journal_macro, doi=identifier)
+    reference = identifier
+    if len(reference) == 18:
+        reference += generator.choice(INITIALS)
+    # Identifiers found in pdfs may be lower case
+    journal_macro, journal = '\\apj', reference[4:9].strip('.')
+    for macro, name in JOURNALS:
+        if name.lower() == journal.lower():
+            journal_macro, journal = macro, name
+            break
+    reference = reference[:4] + '{0:.<5}'.format(journal) + reference[9:]
+    eprint = None
+    if journal == 'arXiv':
+        eprint = reference[9:-1]
+    return entry_lines(generator, reference, int(reference[:4]),
+                       journal_macro, eprint=eprint)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Serve generated ADS bibtex entries on 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="The port to listen on (default: 8765)")
+    parser.add_argument("--delay", type=float, default=0.,
+                        help="The time taken to answer each request, in"
+                             " seconds (default: 0)")
+    args = parser.parse_args()
+    ads = FakeADS(args.port, args.delay)
+    print("Serving ADS entries as mirror {0}".format(ads.mirror))
+    try:
+        ads.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""
+Generate the inputs of the benchmarks: .bib files of entries in the format of
+ADS, .aux files citing some of their entries, and pdfs with identifiers in
+their metadata. The same seed always generates the same files.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, io, os, random
+
+
+SURNAMES = ['Smith', 'Jones', 'Brown', 'Zhang', 'Wang', 'Nakamura', 'Kim',
+            'Garc{\\\'\\i}a', 'M{\\"u}ller', 'Ivezi{\\\'c}', 'Schr{\\"o}der',
+            'O{\\\'o}', 'van der Berg', 'de la Cruz', 'P{\\\'e}rez',
+            '{\\v Z}ak', '{\\AA}str{\\"o}m', 'Kowalski', 'Nguyen',
+            'Fern{\\\'a}ndez', 'Johansson', 'Le F{\\`e}vre', 'Dunlop',
+            'Rodr{\\\'{\\i}}guez', 'Bj{\\o}rnsson']
+INITIALS = 'ABCDEFGHJKLMNPRSTVWZ'
+# ADS journal macros : the journal in bibcodes
+JOURNALS = [('\\apj', 'ApJ'), ('\\apjl', 'ApJ'), ('\\apjs', 'ApJS'),
+            ('\\mnras', 'MNRAS'), ('\\aap', 'A&A'), ('\\aj', 'AJ'),
+            ('\\pasp', 'PASP'), ('\\nat', 'Natur'),
+            ('ArXiv e-prints', 'arXiv')]
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep',
+          'oct', 'nov', 'dec']
+SUBJECTS = ['Star formation', 'Dust', 'Quasars', 'Galaxy clusters',
+            'Cosmic reionization', 'Dark matter haloes', 'Exoplanets',
+            'Stellar populations']
+OBJECTS = ['{H$_{2}$}', '{\\it z}~{\\gt}~6 galaxies', '{Ly$\\alpha$}',
+           'M$_{\\odot}$ black holes', '{\\ion{C}{iv}}', '{SDSS}',
+           '{\\it Herschel}', 'the {Milky Way}']
+KEYWORDS = ['galaxies: evolution', 'galaxies: high-redshift',
+            'cosmology: observations', 'stars: formation',
+            'ISM: molecules', 'quasars: general', 'dust, extinction',
+            'infrared: galaxies', 'methods: statistical']
+# ADS wraps values at about this many characters
+_WRAP = 78
+
+
+def bibcode(year, journal, volume, page, initial):
+    """
+    Format an ADS bibcode eg '2012ApJ...745....1S'
+    """
+    return '{0}{1:.<5}{2:.>4}.{3:.>4}{4}'.format(year, journal, volume, page,
+                                                 initial)
+
+
+def entry_lines(generator, reference, year, journal_macro, doi=None,
+                eprint=None):
+    """
+    Generate the lines of an entry in the format of ADS
+
+    Parameters
+    ----------
+    generator : random.Random
+        The random number generator
+    reference : string
+        The bibcode of the entry
+    year : int
+        The year of the entry
+    journal_macro : string
+        The journal of the entry eg '\\apj'
+    doi : string, optional
+        The DOI of the entry (default: None = no DOI)
+    eprint : string, optional
+        The arXiv identifier of the entry (default: None = no eprint)
+
+    Returns
+    -------
+    list of strings
+        The lines of the entry, including a blank line after it
+    """
+    # Mostly a few authors, sometimes a large collaboration
+    authors = min(1 + int(generator.lognormvariate(1.0, 1.0)), 200)
+    names = []
+    for author in range(authors):
+        initials = '~'.join(generator.choice(INITIALS) + '.'
+                            for initial in range(generator.randint(1, 3)))
+        names.append('{{{0}}}, {1}'.format(generator.choice(SURNAMES),
+                                           initials))
+    if authors > 50:
+        names = names[:10] + ['et al.']
+    title = '{0} and {1}: {2}'.format(generator.choice(SUBJECTS),
+                                      generator.choice(OBJECTS),
+                                      reference)
+    fields = [('author', '{' + ' and '.join(names) + '}'),
+              ('title', '"{' + title + '}"'),
+              ('journal', '{' + journal_macro + '}'),
+              ('keywords', '{' + ', '.join(generator.sample(
+                                 KEYWORDS, generator.randint(0, 4))) + '}'),
+              ('year', str(year)),
+              ('month', generator.choice(MONTHS)),
+              ('volume', str(generator.randint(1, 999))),
+              ('pages', '{{{0}-{1}}}'.format(reference[-5:-1].strip('.'),
+                                             generator.randint(1, 999)))]
+    if fields[3][1] == '{}':
+        del fields[3]
+    if doi is not None:
+        fields.append(('doi', '{' + doi + '}'))
+    if eprint is not None:
+        fields += [('archivePrefix', '"arXiv"'),
+                   ('eprint', '{' + eprint + '}'),
+                   ('primaryClass', '"astro-ph.GA"')]
+    fields += [('adsurl', '{http://adsabs.harvard.edu/abs/' + reference + '}'),
+               ('adsnote', '{Provided by the SAO/NASA Astrophysics Data'
+                           ' System}')]
+    lines = ['@ARTICLE{' + reference + ',\n']
+    for index, (key, value) in enumerate(fields):
+        ending = ',\n' if index < len(fields) - 1 else '\n'
+        lines.extend(_wrap('{0:>8} = {1}{2}'.format(key, value, ending)))
+    lines += ['}\n', '\n']
+    return lines
+
+
+def _wrap(line):
+    """
+    Wrap a line at spaces as ADS does, indenting the following lines with a
+    tab
+    """
+    lines = []
+    while len(line) > _WRAP:
+        split = line.rfind(' ', 20, _WRAP)
+        if split < 0:
+            break
+        lines.append(line[:split + 1] + '\n')
+        line = '\t' + line[split + 1:]
+    return lines + [line]
+
+
+def library_entries(entries, seed=1):
+    """
+    Generate the entries of a library
+
+    Parameters
+    ----------
+    entries : int
+        The number of entries
+    seed : int, optional
+        The seed of the random number generator (default: 1)
+
+    Yields
+    ------
+    tuple: 2 elements, (string, list of strings)
+        The reference and the lines of each entry
+    """
+    generator = random.Random(seed)
+    for number in range(entries):
+        year = generator.randint(1990, 2016)
+        journal_macro, journal = generator.choice(JOURNALS)
+        # The volume and page make the bibcode unique
+        reference = bibcode(year, journal, 100 + number // 9999,
+                            1 + number % 9999, generator.choice(INITIALS))
+        doi = eprint = None
+        if generator.random() < 0.8:
+            doi = '10.{0}/{1}'.format(generator.choice(['1088', '1093',
+                                                        '1051']),
+                                      reference.replace('.', '').lower())
+        if generator.random() < 0.5:
+            eprint = '{0:02d}{1:02d}.{2:05d}'.format(
+                    year % 100, generator.randint(1, 12), number % 100000)
+        yield reference, entry_lines(generator, reference, year,
+                                     journal_macro, doi, eprint)
+
+
+def generate_library(path, entries, seed=1):
+    """
+    Write a .bib file of entries in the format of ADS
+
+    Parameters
+    ----------
+    path : string
+        The path to the .bib file
+    entries : int
+        The number of entries
+    seed : int, optional
+        The seed of the random number generator (default: 1)
+
+    Returns
+    -------
+    list of strings
+        The references of the entries, in file order
+    """
+    references = []
+    with io.open(path, 'w', encoding='utf-8') as bib_file:
+        for reference, lines in library_entries(entries, seed):
+            references.append(reference)
+            bib_file.write(''.join(lines))
+    return references
+
+
+def generate_aux(path, references, citations, seed=1):
+    """
+    Write a .aux file citing some references, several to a \\citation
+
+    Parameters
+    ----------
+    path : string
+        The path to the .aux file
+    references : list of strings
+        The references to cite from
+    citations : int
+        The number of references to cite
+    seed : int, optional
+        The seed of the random number generator (default: 1)
+    """
+    generator = random.Random(seed)
+    cited = generator.sample(references, min(citations, len(references)))
+    with io.open(path, 'w', encoding='utf-8') as aux_file:
+        aux_file.write('\\relax\n')
+        for start in range(0, len(cited), 3):
+            aux_file.write('\\citation{' + ','.join(cited[start:start + 3])
+                           + '}\n')
+        aux_file.write('\\bibstyle{apj_style}\n\\bibdata{library}\n')
+
+
+def generate_pdfs(directory, count, seed=1):
+    """
+    Write pdfs with an identifier (a bibcode, DOI or arXiv identifier) in the
+    Info dictionary, so that pdftobib identifies them without pdftotext
+
+    Parameters
+    ----------
+    directory : string
+        The directory to write the pdfs to
+    count : int
+        The number of pdfs
+
+    Returns
+    -------
+    list of strings
+        The paths to the pdfs
+    """
+    generator = random.Random(seed)
+    paths = []
+    for number in range(count):
+        kind = number % 3
+        if kind == 0:
+            identifier = bibcode(generator.randint(1990, 2016), 'ApJ',
+                                 700 + number // 9999, 1 + number % 9999,
+                                 generator.choice(INITIALS))
+        elif kind == 1:
+            identifier = 'doi:10.1088/0004-637X/{0}/1/{1}'.format(
+                                                700 + number // 999, number)
+        else:
+            identifier = 'arXiv:{0:02d}{1:02d}.{2:04d}'.format(
+                    generator.randint(8, 14), generator.randint(1, 12),
+                    1 + number % 9999)
+        path = os.path.join(directory, 'paper{0:05d}.pdf'.format(number))
+        _write_pdf(path, identifier)
+        paths.append(path)
+    return paths
+
+
+def _write_pdf(path, identifier):
+    """
+    Write a minimal pdf (without pages) with an identifier as its keywords
+    """
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>',
+               b'<< /Type /Pages /Kids [] /Count 0 >>',
+               b'<< /Title (A paper) /Keywords (' + identifier.encode('ascii')
+               + b') >>']
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for number, pdf_object in enumerate(objects):
+        offsets.append(len(pdf))
+        pdf += ('{0} 0 obj\n'.format(number + 1).encode('ascii') +
+                pdf_object + b'\nendobj\n')
+    xref = len(pdf)
+    pdf += 'xref\n0 {0}\n0000000000 65535 f \n'.format(
+                                        len(objects) + 1).encode('ascii')
+    for offset in offsets:
+        pdf += '{0:010d} 00000 n \n'.format(offset).encode('ascii')
+    pdf += ('trailer\n<< /Size {0} /Root 1 0 R /Info 3 0 R >>\n'
+            'startxref\n{1}\n%%EOF\n'.format(len(objects) + 1, xref)
+            ).encode('ascii')
+    with open(path, 'wb') as pdf_file:
+        pdf_file.write(pdf)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Generate a .bib file of entries in the format of ADS")
+    parser.add_argument("entries", type=int,
+                        help="The number of entries eg 1000 to 1000000")
+    parser.add_argument("bib_file", type=str, help="The .bib file to write")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="The seed of the random number generator"
+                             " (default: 1)")
+    args = parser.parse_args()
+    generate_library(args.bib_file, args.entries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Check that the offline command line tools start quickly: time the imports of
+each with python -X importtime, failing if any takes longer than its budget,
+or imports any of the network or pdf modules, or the profiler.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, os, subprocess, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+
+
+# Offline tool : the bibtex modules it imports
+TOOLS = {
+    'mnbib': ['bibtex.bibtexfile', 'bibtex.citations', 'bibtex.stats'],
+    'bibmerge': ['bibtex.merge'],
+    'bibsearch': ['bibtex.bibtexfile', 'bibtex.search'],
+    'bibquery': ['bibtex.client'],
+}
+# Longest time the imports of each tool may take, in milliseconds
+BUDGETS = {
+    'mnbib': 60,
+    'bibmerge': 70,
+    'bibsearch': 60,
+    'bibquery': 35,
+}
+# Modules only the tools that query ADS or read pdfs should import, and the
+# profiler, imported only with --profile
+FORBIDDEN = ['bibtex.ads', 'bibtex.resolver', 'bibtex.scanner',
+             'bibtex.pdfmeta', 'bibtex.watch', 'http.client', 'ssl',
+             'subprocess', 'multiprocessing', 'urllib.request', 'cProfile']
+
+
+def import_times(modules):
+    """
+    Import modules in a new interpreter, with python -X importtime
+
+    Parameters
+    ----------
+    modules : list of strings
+        The modules to import
+
+    Returns
+    -------
+    dictionary
+        Each module imported, including those imported by python itself
+        before the modules : its cumulative import time in microseconds
+    """
+    command = [sys.executable, '-X', 'importtime', '-c',
+               'import ' + ', '.join(modules) if modules else 'pass']
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.Popen(command, stderr=subprocess.PIPE,
+                               cwd=ROOT, env=environment)
+    output = process.communicate()[1].decode('utf-8')
+    if process.returncode != 0:
+        raise RuntimeError(output)
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented, only count each module at the top
+        times[name.strip()] = (int(cumulative), not name[1:].startswith(' '))
+    return times
+
+
+def time_tool(modules, startup, repeat):
+    """
+    Get the median time taken to import the modules of a tool, and the
+    modules they import
+
+    Parameters
+    ----------
+    modules : list of strings
+        The modules the tool imports
+    startup : set of strings
+        The modules python imports before running any code
+    repeat : int
+        The number of times to import the modules
+
+    Returns
+    -------
+    tuple: 2 elements, (float, set of strings)
+        The median time in milliseconds, and the modules imported
+    """
+    totals = []
+    for attempt in range(repeat):
+        times = import_times(modules)
+        totals.append(sum(cumulative for name, (cumulative, top)
+                          in times.items() if top and name not in startup))
+    totals.sort()
+    return totals[len(totals) // 2] / 1000., set(times) - startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--repeat", type=int, default=7,
+                        help="The number of times to import the modules of"
+                             " each tool, the median time is compared with"
+                             " its budget (default: 7)"
+                        )
+    parser.add_argument("--scale", type=float, default=1.,
+                        help="Multiply the budgets by this, for slower"
+                             " machines (default: 1)"
+                        )
+    args = parser.parse_args()
+    if sys.version_info < (3, 7):
+        parser.error("python -X importtime needs Python 3.7 or later")
+
+    # Compile the modules first, so that is not timed
+    import_times(sorted(set(sum(TOOLS.values(), []))))
+    startup = set(import_times([]))
+    failed = False
+    for tool in sorted(TOOLS):
+        median, imported = time_tool(TOOLS[tool], startup, args.repeat)
+        budget = BUDGETS[tool] * args.scale
+        print("{0:<12} {1:7.1f} ms  (budget {2:.0f} ms)".format(tool, median,
+                                                               budget))
+        if median > budget:
+            print("*** {0} takes {1:.1f} ms to import, over its budget of"
+                  " {2:.0f} ms".format(tool, median, budget))
+            failed = True
+        for module in sorted(imported.intersection(FORBIDDEN)):
+            print("*** {0} imports {1}".format(tool, module))
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
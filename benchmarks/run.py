@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+"""
+Run the benchmarks on generated inputs, write the times to a JSON file, and
+compare them with the stored baselines, failing if any benchmark is slower
+than its baseline by more than a threshold.
+
+Benchmarks are named eg 'write_to_file/10000' for a library of 10000 entries.
+"""
+
+from __future__ import print_function, unicode_literals
+import argparse, glob, io, json, os, platform, shutil, subprocess, sys
+import tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, ROOT)
+from bibtex.article import Article
+from bibtex.bibtexfile import BibtexFile, _iter_entries
+from bibtex.entry import _latex_to_text, _parse_bibtex_entry
+
+from fake_ads import FakeADS
+from generate import generate_aux, generate_library, generate_pdfs
+
+
+BASELINES = os.path.join(HERE, 'baselines.json')
+FIXTURES = os.path.join(HERE, 'fixtures', 'first_pages')
+
+
+def best_time(function, repeat, setup=None):
+    """
+    Get the shortest time taken by a function over several calls
+
+    Parameters
+    ----------
+    function : function
+        The function to time, called without arguments
+    repeat : int
+        The number of times to call it
+    setup : function, optional
+        A function called before each call, which is not timed
+
+    Returns
+    -------
+    float
+        The shortest time in seconds
+    """
+    times = []
+    for attempt in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def bench_library(directory, entries, repeat):
+    """
+    Time reading, parsing, writing and subsetting a generated library
+
+    Returns
+    -------
+    dictionary
+        Benchmark name : time in seconds
+    """
+    path = os.path.join(directory, 'library{0}.bib'.format(entries))
+    references = generate_library(path, entries)
+    results = {}
+    # Time parsing the file, not loading a snapshot of it
+    BibtexFile.snapshot_dir = None
+
+    def import_file():
+        return BibtexFile(path)
+    results['import_articles_from_file'] = best_time(import_file, repeat)
+
+    with open(path, 'r') as bib_file:
+        bibtexs = [bibtex for entry_type, bibtex in _iter_entries(bib_file)]
+    results['_parse_bibtex_entry'] = best_time(
+                lambda: [_parse_bibtex_entry(bibtex) for bibtex in bibtexs],
+                repeat)
+
+    bib_file = import_file()
+    output_path = os.path.join(directory, 'written.bib')
+    results['write_to_file'] = best_time(
+                lambda: bib_file.write_to_file(output_path), repeat)
+
+    # Convert without the cache, as for a library seen for the first time
+    latex_to_text = getattr(_latex_to_text, '__wrapped__', _latex_to_text)
+    strings = ([article.author for article in bib_file.articles] +
+               [article.title for article in bib_file.articles])
+    results['_latex_to_text'] = best_time(
+                lambda: [latex_to_text(string) for string in strings], repeat)
+
+    # Copy the entries cited by a paper, indexing the library the first time
+    aux_path = os.path.join(directory, 'paper.aux')
+    generate_aux(aux_path, references, 100)
+    mnbib = [sys.executable, os.path.join(ROOT, 'bin', 'mnbib'), path,
+             aux_path, os.path.join(directory, 'paper.bib')]
+    results['mnbib_first_run'] = best_time(
+                lambda: _run(mnbib, directory), repeat,
+                setup=lambda: _remove(path + '.index'))
+    results['mnbib'] = best_time(lambda: _run(mnbib, directory), repeat)
+
+    return dict(('{0}/{1}'.format(name, entries), seconds)
+                for name, seconds in results.items())
+
+
+def bench_identifier(repeat):
+    """
+    Time finding the identifiers in the fixture first page texts
+
+    Returns
+    -------
+    dictionary
+        Benchmark name : time in seconds
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.txt'))):
+        with io.open(path, encoding='utf-8', errors='replace') as page:
+            pages.append(page.readlines())
+    article = Article()
+    article.path = 'paper.pdf'
+
+    def identify_pages():
+        for attempt in range(100):
+            for pdf_txt in pages:
+                article._identifier_from_article(pdf_txt)
+    return {'_identifier_from_article/{0}'.format(100 * len(pages)):
+            best_time(identify_pages, repeat)}
+
+
+def bench_pdftobib(directory, pdfs, repeat):
+    """
+    Time pdftobib adding generated pdfs to a new .bib file, with entries
+    from a fake ADS mirror
+
+    Returns
+    -------
+    dictionary
+        Benchmark name : time in seconds
+    """
+    pdf_directory = os.path.join(directory, 'pdfs')
+    bib_path = os.path.join(directory, 'articles.bib')
+
+    def setup():
+        _remove(bib_path)
+        shutil.rmtree(pdf_directory, ignore_errors=True)
+        os.mkdir(pdf_directory)
+        generate_pdfs(pdf_directory, pdfs)
+    ads = FakeADS().start()
+    try:
+        pdftobib = [sys.executable, os.path.join(ROOT, 'bin', 'pdftobib'),
+                    pdf_directory + '/', bib_path, '--ads-mirror', ads.mirror,
+                    '--no-cache', '--no-manifest']
+        seconds = best_time(lambda: _run(pdftobib, directory), repeat, setup)
+    finally:
+        ads.stop()
+    return {'pdftobib/{0}'.format(pdfs): seconds}
+
+
+def _run(command, directory):
+    """
+    Run a script with the package importable, failing if it fails
+    """
+    environment = dict(os.environ, PYTHONPATH=ROOT,
+                       XDG_CACHE_HOME=os.path.join(directory, 'cache'))
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(command, env=environment, stdout=devnull)
+
+
+def _remove(path):
+    """
+    Remove a file, if it exists
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def compare(results, baselines, threshold):
+    """
+    Print the results next to their baselines
+
+    Parameters
+    ----------
+    results : dictionary
+        Benchmark name : time in seconds
+    baselines : dictionary
+        Benchmark name : baseline time in seconds
+    threshold : float
+        The largest acceptable ratio of a time to its baseline
+
+    Returns
+    -------
+    list of strings
+        The names of the benchmarks slower than their baseline by more than
+        threshold
+    """
+    regressions = []
+    for name in sorted(results):
+        seconds = results[name]
+        if name not in baselines:
+            print("{0:40} {1:9.4f} s".format(name, seconds))
+            continue
+        ratio = seconds / baselines[name]
+        flag = ''
+        if ratio > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print("{0:40} {1:9.4f} s  baseline {2:9.4f} s  x{3:.2f}{4}".format(
+                                name, seconds, baselines[name], ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Run the benchmarks and compare them with baselines")
+    parser.add_argument("--entries", type=int, nargs='+',
+                        default=[1000, 10000],
+                        help="The sizes of the libraries to generate, up to"
+                             " 1000000 (default: 1000 10000)")
+    parser.add_argument("--pdfs", type=int, default=60,
+                        help="The number of pdfs for pdftobib (default: 60)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="The number of times to run each benchmark, the"
+                             " shortest time is kept (default: 3)")
+    parser.add_argument("--output", type=str,
+                        default='benchmark-results.json',
+                        help="The JSON file to write the results to"
+                             " (default: benchmark-results.json)")
+    parser.add_argument("--baselines", type=str, default=BASELINES,
+                        help="The JSON file of baseline times"
+                             " (default: benchmarks/baselines.json)")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="Fail if a benchmark takes longer than this"
+                             " multiple of its baseline (default: 1.5)")
+    parser.add_argument("--update-baselines", action="store_true",
+                        help="Store the times as the baselines")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        results = bench_identifier(args.repeat)
+        for entries in args.entries:
+            results.update(bench_library(directory, entries, args.repeat))
+        results.update(bench_pdftobib(directory, args.pdfs, args.repeat))
+    finally:
+        shutil.rmtree(directory)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'results': results},
+                  output_file, indent=1, sort_keys=True)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as baselines_file:
+            baselines = json.load(baselines_file)['results']
+    regressions = compare(results, baselines, args.threshold)
+    if args.update_baselines:
+        baselines.update(results)
+        with open(args.baselines, 'w') as baselines_file:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'results': baselines},
+                      baselines_file, indent=1, sort_keys=True)
+        print("Updated the baselines in {0}".format(args.baselines))
+    elif regressions:
+        print("{0} benchmarks slower than {1} times their baseline".format(
+                                        len(regressions), args.threshold))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
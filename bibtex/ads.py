@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import collections, random, socket, threading, time
+try:
+    import http.client as httplib
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urlsplit
+except ImportError:
+    import httplib
+    from urllib2 import HTTPError, URLError
+    from urlparse import urlsplit
+
+from bibtex.entry import ADS_MIRRORS
+
+
+class ADSClient(object):
+
+    def __init__(self, mirrors=None, retries=3, backoff=0.5, timeout=30,
+                 explore=0.05, history_size=1000):
+        """
+        An HTTP client for ADS that keeps connections to the mirrors open,
+        retries failed requests with jittered exponential backoff, and fails
+        over between mirrors, preferring the mirror with the lowest latency
+
+        A client can be shared between threads, each thread has its own
+        connections.
+
+        Parameters
+        ----------
+        mirrors : list of strings, optional
+            Ranked ADS mirrors, as host or host:port (default: ADS_MIRRORS)
+        retries : int, optional
+            The number of times to retry a failed request (default: 3)
+        backoff : float, optional
+            The delay before the first retry in seconds, doubled for each
+            retry after that (default: 0.5)
+        timeout : float, optional
+            The timeout of a request in seconds (default: 30)
+        explore : float, optional
+            The fraction of requests sent to a mirror other than the fastest,
+            so that the latency of every mirror stays known (default: 0.05)
+        history_size : int, optional
+            The number of recent requests kept in history, so that a client
+            used for a long time does not grow (default: 1000)
+        """
+        if mirrors is None:
+            mirrors = ADS_MIRRORS
+        self.mirrors = list(mirrors)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.explore = explore
+        # Smoothed latency of each mirror, in seconds
+        self.latency = dict((mirror, None) for mirror in self.mirrors)
+        # (mirror, latency in seconds, number of retries) of each recent
+        # request
+        self.history = collections.deque(maxlen=history_size)
+        # The number of successful requests, and of retries they needed
+        self.requests = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+
+    def ranked_mirrors(self):
+        """
+        Get the mirrors in the order they will be tried
+
+        Mirrors are ordered by smoothed latency, where a failed request counts
+        as taking the timeout, and a mirror that has not been used counts as
+        having a latency of the timeout.
+
+        Returns
+        -------
+        list of strings
+            The mirrors, fastest first
+        """
+        with self._lock:
+            def rank(index_mirror):
+                latency = self.latency[index_mirror[1]]
+                if latency is None:
+                    latency = self.timeout
+                return (latency, index_mirror[0])
+            return [mirror for index, mirror
+                    in sorted(enumerate(self.mirrors), key=rank)]
+
+
+    def get(self, url):
+        """
+        Get the body of a response from ADS
+
+        Parameters
+        ----------
+        url : string
+            A URL of any ADS mirror, only the path and query are used
+
+        Returns
+        -------
+        bytes
+            The body of the response
+
+        Raises
+        ------
+        HTTPError
+            If ADS responds with a client error (eg 404)
+        URLError
+            If no mirror responded successfully after all retries
+        """
+        parts = urlsplit(url)
+        path = parts.path
+        if parts.query:
+            path += '?' + parts.query
+        mirrors = self.ranked_mirrors()
+        if len(mirrors) > 1 and random.random() < self.explore:
+            mirrors.insert(0, mirrors.pop(random.randrange(1, len(mirrors))))
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                # Jittered exponential backoff
+                time.sleep(self.backoff * 2 ** (attempt - 1)
+                           * random.uniform(0.5, 1.5))
+            mirror = mirrors[attempt % len(mirrors)]
+            start = time.time()
+            try:
+                status, reason, headers, body = self._request(mirror, path)
+            except (socket.error, httplib.HTTPException) as exception:
+                self._record(mirror, None)
+                error = exception
+                continue
+            if status >= 500 or status == 429:
+                self._record(mirror, None)
+                error = '{0} {1} from {2}'.format(status, reason, mirror)
+                continue
+            self._record(mirror, time.time() - start, attempt)
+            if status >= 400:
+                raise HTTPError('http://' + mirror + path, status, reason,
+                                headers, None)
+            return body
+        raise URLError('ADS request failed after {0} attempts: {1}'.format(
+                                                    self.retries + 1, error))
+
+
+    def close(self):
+        """
+        Close this thread's connections to the mirrors
+        """
+        for connection in self._connections().values():
+            connection.close()
+        self._local.connections = {}
+
+
+    def _connections(self):
+        """
+        Get this thread's open connections, mirror : HTTPConnection
+        """
+        try:
+            return self._local.connections
+        except AttributeError:
+            self._local.connections = {}
+            return self._local.connections
+
+
+    def _request(self, mirror, path):
+        """
+        Make a GET request to a mirror, reusing an open connection if possible
+
+        Returns
+        -------
+        tuple: 4 elements, (status, reason, headers, body)
+        """
+        connections = self._connections()
+        connection = connections.get(mirror)
+        reused = connection is not None
+        if not reused:
+            connection = connections[mirror] = httplib.HTTPConnection(
+                                                mirror, timeout=self.timeout)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            body = response.read()
+        except Exception as error:
+            # The connection may be stale, open a new one next time
+            connection.close()
+            del connections[mirror]
+            if (reused and isinstance(error, (socket.error,
+                                              httplib.HTTPException)) and
+                    not isinstance(error, socket.timeout)):
+                # The mirror closed the kept-alive connection, which is not
+                # a failure of the mirror, so retry at once on a new one
+                return self._request(mirror, path)
+            raise
+        if response.getheader('connection', '').lower() == 'close':
+            connection.close()
+            del connections[mirror]
+        return response.status, response.reason, response.msg, body
+
+
+    def _record(self, mirror, latency, retries=None):
+        """
+        Update the smoothed latency of a mirror after a request, a latency of
+        None is a failed request
+        """
+        with self._lock:
+            if latency is not None:
+                self.history.append((mirror, latency, retries))
+                self.requests += 1
+                self.retried += retries
+            else:
+                latency = self.timeout
+            previous = self.latency[mirror]
+            if previous is None:
+                self.latency[mirror] = latency
+            else:
+                self.latency[mirror] = 0.7 * previous + 0.3 * latency
@@ -1,23 +1,41 @@
 # -*- coding: utf-8 -*-
+"""
+Articles, created from bibtex entries or from pdfs identified and resolved
+with ADS
+
+The ADS client, the identifier scanner, urllib and subprocess are only
+imported when an Article first queries ADS or reads a pdf, so that reading and
+writing bibtex files (see bibtex.entry) does not pay for them.
+"""
 
 from __future__ import print_function, unicode_literals
-import os, re, subprocess, sys
-from string import whitespace
-try:
-    import urllib
-    import urllib.request as req
-    from urllib.parse import quote
-except ImportError:
-    from urllib import quote
-    import urllib2 as req
-    import codecs
-    reload(sys)  # Hack to put setdefaultencoding back in after python startup
-    sys.setdefaultencoding('utf-8')  # Output utf-8 to teminal
+import io, os, time
+
+from bibtex.entry import (ADS_MIRRORS, _format_journal, _latex_to_text,
+                          _parse_bibtex_entry)
+# Kept here as they were defined here before bibtex.entry
+from bibtex.entry import LazyArticle, _normalise_arxiv, _normalise_doi
+from bibtex.snapshot import file_hash
 
 
 class Article:
 
-    def __init__(self, path=None, bibtex=None):
+    # ADS mirror to query (to take load off adsabs.harvard.edu)
+    ads_mirror = 'esoads.eso.org'
+    # HTTP client for ADS, which may fail over to other mirrors (None = an
+    # ADSClient for ADS_MIRRORS, created when ADS is first queried)
+    ads_client = None
+    # Persistent cache of ADS responses (a bibtex.cache.Cache), if any
+    cache = None
+    # Only use cached ADS responses, never query ADS
+    offline = False
+    # Persistent cache of the first page text of pdfs, if any
+    text_cache = None
+    # Timings of identifying pdfs, ADS requests and renaming pdfs (a
+    # bibtex.stats.Stats), if any
+    stats = None
+
+    def __init__(self, path=None, bibtex=None, pdf_txt=None, resolve=True):
         """
         Constructor, takes optional path to pdf or bibtex (list of strings)
 
@@ -27,23 +45,25 @@ class Article:
             A path to a pdf to parse and retrieve bibtex from ADS
         bibtex : list of strings, optional
             A list containing a bibtex entry for an article
+        pdf_txt : list of strings, optional
+            The text of the first page of the pdf at path, if it has already
+            been extracted (default: None = extract it with pdftotext)
+        resolve : bool, optional
+            Retrieve the bibtex entry of the pdf at path from ADS and rename
+            the pdf, otherwise only identify it and leave this to a later call
+            of resolve (default: True)
         """
         self.path = path
-        # ADS mirror to query (to take load off adsabs.harvard.edu)
-        self.ads_mirror = 'esoads.eso.org'
 
         # If a pdf has been given
         if path is not None:
             # Extract identifying information from the pdf
             self.identifier, self.identifier_type = \
-                                             self._identifier_from_article()
+                                      self._identifier_from_article(pdf_txt)
             # Construct a url linking to the article bibtex entry at ADS
             self.url = self._bibtex_url()
-            # Parse the bibtex entry
-            self._import_from_bibtex_url()
-            # Rename the file in the pattern
-            # author - year - ads_bibcode - title.pdf
-            self._rename_file()
+            if resolve:
+                self.resolve()
 
         # If a list of strings containing a bibtex entry has been given
         if bibtex is not None:
@@ -57,11 +77,36 @@ class Article:
         return self.reference
 
 
-    def _identifier_from_article(self):
+    def resolve(self, bibtex=None):
+        """
+        Parse the bibtex entry for an article created from a pdf, and rename
+        the pdf
+
+        Parameters
+        ----------
+        bibtex : list of strings, optional
+            The bibtex entry for the article (default: None = retrieve it from
+            ADS)
+        """
+        # Parse the bibtex entry
+        if bibtex is None:
+            self._import_from_bibtex_url()
+        else:
+            self.import_from_bibtex(bibtex)
+        # Rename the file in the pattern
+        # author - year - ads_bibcode - title.pdf
+        self._rename_file()
+
+
+    def _identifier_from_article(self, pdf_txt=None):
         """
         Extract identifying information from a text file converted from a pdf
 
-        Long method with lots of regex magic
+        Parameters
+        ----------
+        pdf_txt : list of strings, optional
+            The text of the first page of the pdf (default: None = extract it
+            from self.path)
 
         Returns
         -------
@@ -69,132 +114,31 @@ class Article:
             identifier type can be {'doi', arxiv', 'abs'}
         """
         # Convert the first page of the pdf to text so it can be parsed
-        txt = 'pdf.txt'
-        subprocess.call(['pdftotext', '-l', '1', self.path, txt],
-                        shell=False, stderr=subprocess.PIPE)
-        # Read the text file
-        if sys.version_info[0] < 3:
-            pdf_txt = codecs.open(txt, 'r', 'utf-8').readlines()
-        else:
-            pdf_txt = open(txt, 'r').readlines()
-        os.remove(txt)
-
-        # First search for DOI and ABS/arXiv bibcode by regex
-        bibcode = None
-        for line in [self.path] + pdf_txt:
-            line = line.lower()
-            try:
-                #abs bibcode
-                identifier_type = 'abs'
-                identifier = re.search(r'[0-9]{4}'     # year
-                                       r'[a-z&]{2,6}'  # journal
-                                       r'\.*'          # some number of .'s
-                                       r'[0-9]{1,4}'   # volume
-                                       r'[a-z]?'       # can have 'L' etc
-                                       r'\.*'          # some number of .'s
-                                       r'[0-9]{1,4}'   # start page
-                                       r'[a-z]{1,2}',  # author initial
-                                       line          ).group()[:-1]
-                return identifier, identifier_type
-            except AttributeError:
-                pass
-            try:
-                #arxiv bibcode
-                bibcode = line.index('arxiv')
-                if line[bibcode + 5] == ')':
-                    continue
-                if line.split()[0][:5] != 'arxiv':
-                    continue
-                bibcode = line.split()[0][6:]
-                if bibcode[-2] == 'v':
-                    bibcode = bibcode[:-2]
-                identifier_type = 'arxiv'
-                identifier = bibcode
-                return identifier, identifier_type
-            except ValueError:
-                pass
-            try:
-                identifier_type = 'doi'
-                identifier = re.search(r'[0-9]{2}'       # 2 digits
-                                       r'\.'             # .
-                                       r'[0-9]{4}'       # 4 digits
-                                       r'/'              # /
-                                       r'.*?'            # min num of anything
-                                       r'(?=[\ (\n)])',  # end at space/newline
-                                       line            ).group()
-                return identifier, identifier_type
-            except AttributeError:
-                continue
-
-        # Not found, so have to construct an ABS bibcode
-        # List so that order is preserved (for apjs)
-        journals = [['a&a', 'aap'],
-                    ['asp conference series', 'aspc'],
-                    ['the astronomical journal', 'aj'],
-                    ['the astrophysical journal', 'apj'],
-                    ['the astrophysical journal supplement', 'apjs'],
-                    ['annu. rev. astron. astrophys.', 'ara&a'],
-                    ['annu. rev. astro. astrophys.', 'ara&a'],
-                    ['mon. not. r. astron. soc.', 'mnras'],
-                    ['pasj', 'pasj'],
-                    ['res. astron. astrophys.', 'raa'],
-                    ['research in astron. astrophys.', 'raa']
-                   ]
-        for line in pdf_txt:
-            line = line.lower()
-            # Look for a single line with a journal name and year
-            if (any(j[0] in line for j in journals) and
-                    re.search('[0-9]{4}', line)):
-                # Journal
-                journal = [j[1] for j in journals if j[0] in line][-1]
-                # Volume and first page
-                vol_pages_re = (r'[0-9]{1,4}'     # volume
-                                r'[:,\s]{1,4}'    # volume-pages separator
-                                r'l?'             # if a Letter
-                                r'[0-9]{1,4}'     # start page s
-                                r'([-––è]|\sy)?'  # start-end page sep
-                                r'l?'             # if a letter
-                                r'([0-9]{1,4})?'  # end page (may not exist)
-                               )
-                vol_pages = re.search(vol_pages_re, line).group()
-                volume = re.search(r'[0-9]{1,4}[:,\s]', vol_pages).group()[:-1]
-                pages = re.sub(volume, '', vol_pages)
-                qualifier = '.'
-                if re.search('l', pages):
-                    qualifier = 'l'
-                page = re.search(r'[0-9]{1,4}', pages).group()
-
-                # Year
-                year_line = re.sub([j[1] for j in journals if j[0] in line][0],
-                                   '', line)
-                year_line = re.sub(vol_pages, '', year_line)
-                year = re.search('[0-9]{4}', year_line).group()
-
-                # Construct bibcode from parts derived above
-                identifier_type = 'abs'
-                identifier = ''.join([year, journal,
-                                           '.' * (9 - len(journal)
-                                                    - len(volume) ),
-                                           volume, qualifier,
-                                           '.' * (4 - len(page)), page])
-                return identifier, identifier_type
-
-
-    def _bibtex_url(self):
+        if pdf_txt is None:
+            pdf_txt = _pdf_to_text(self.path)
+        from bibtex.scanner import identify
+        if self.stats is None:
+            return identify(self.path, pdf_txt)
+        start = time.time()
+        identifier, identifier_type = identify(self.path, pdf_txt)
+        self.stats.add_time('identify', time.time() - start)
+        self.stats.count('identifier.' + identifier_type)
+        return identifier, identifier_type
+
+
+    def _ads_bibcode(self):
         """
-        Get a URL of a BibTeX entry for the paper
+        Get the ADS bibcode of the paper from its identifier, if possible
 
         Returns
         -------
-        string
-            A URL that can be resolved to find a BibTeX entry
+        string or None
+            An ADS bibcode, possibly missing the trailing author initial, or
+            None if the identifier is a DOI
         """
-        if self.identifier_type is 'doi':
-            url = ''.join(['http://', self.ads_mirror,
-                           '/cgi-bin/nph-bib_query?',
-                           '&doi={0}'.format(self.identifier),
-                           '&data_type=BIBTEX&db_key=AST&nocookieset=1'     ])
-        elif self.identifier_type is 'arxiv':
+        if self.identifier_type == 'doi':
+            return None
+        elif self.identifier_type == 'arxiv':
             # Two different formats for arxiv_ids (change at 2007)
             # Paper may also have been submitted to another branch e.g. hep
             arxiv_ads = None
@@ -220,32 +164,68 @@ class Article:
                 year = str(year + 1900)
             else:
                 year = str(year + 2000)
-            arxiv_ads = year + arxiv_ads
-            url = ''.join(['http://', self.ads_mirror,
-                           '/cgi-bin/nph-bib_query?',
-                           '&bibcode={0}'.format(arxiv_ads),
-                           '&data_type=BIBTEX&db_key=AST&nocookieset=1'     ])
+            return year + arxiv_ads
+        else:  # ABS code
+            return self.identifier
+
+
+    def _bibtex_url(self):
+        """
+        Get a URL of a BibTeX entry for the paper
+
+        Returns
+        -------
+        string
+            A URL that can be resolved to find a BibTeX entry
+        """
+        if self.identifier_type == 'doi':
+            return _ads_query_url(self.ads_mirror, 'doi', [self.identifier])
+        elif self.identifier_type == 'arxiv':
+            return _ads_query_url(self.ads_mirror, 'bibcode',
+                                  [self._ads_bibcode()], quoted=False)
         else:  # ABS code
-            url = ''.join(['http://', self.ads_mirror,
-                           '/cgi-bin/nph-bib_query?',
-                           '&bibcode={0}'.format(quote(self.identifier)),
-                           '&data_type=BIBTEX&db_key=AST&nocookieset=1'     ])
-        return url
+            return _ads_query_url(self.ads_mirror, 'bibcode',
+                                  [self._ads_bibcode()])
 
 
     def _import_from_bibtex_url(self):
         """
         Get the bibtex entry for the article from ADS and parse it
-        """
-        # Get the entry from self.url
-        full_bibtex_page = req.urlopen(self.url).readlines()
 
-        # Get range of lines to parse
-        bib = []
-        for line in full_bibtex_page[5:-1]:
-            bib.append(line.decode('iso-8859-1'))
+        If Article.cache is set, responses that parse are cached by
+        identifier, and if Article.offline is set only cached responses are
+        used.
+        """
+        key = (self.identifier_type, self.identifier)
+        bib = None
+        requested = False
+        if self.cache is not None:
+            # An empty response may have been cached by an earlier version
+            bib = self.cache.get(key, expired=self.offline) or None
+            if bib is not None and self.stats is not None:
+                self.stats.count('cache_hit.' + self.identifier_type)
+        if bib is None:
+            if self.offline:
+                raise LookupError('No cached ADS entry for {0} {1}'.format(
+                                                                        *key))
+            # Get the entry from self.url
+            start = time.time()
+            full_bibtex_page = io.BytesIO(_ads_client().get(self.url)
+                                          ).readlines()
+            if self.stats is not None:
+                self.stats.add_time('ads_request.' + self.identifier_type,
+                                    time.time() - start)
+
+            # Get range of lines to parse
+            bib = ''.join([line.decode('iso-8859-1')
+                           for line in full_bibtex_page[5:-1]])
+            requested = True
         # Parse these lines
-        self.import_from_bibtex(bib)
+        self.import_from_bibtex(io.StringIO(bib).readlines())
+        # Only cache an entry that parses, so that an empty or error response
+        # is requested again
+        if requested and self.cache is not None:
+            self.cache.set(key, bib)
 
 
     def import_from_bibtex(self, bibtex):
@@ -258,7 +238,19 @@ class Article:
             The bibtex entry to parse
         """
         # Get a dictionary of the bibtex key value pairs
-        self.bibtex = _parse_bibtex_entry(bibtex)
+        self.import_from_dict(_parse_bibtex_entry(bibtex))
+
+
+    def import_from_dict(self, bib_dict):
+        """
+        Fill various member variables from a parsed bibtex entry
+
+        Parameters
+        ----------
+        bib_dict : dictionary
+            The bibtex entry, as parsed by _parse_bibtex_entry (it is changed)
+        """
+        self.bibtex = bib_dict
 
         # Fill member variables from this dictionary
         self.author      = self.bibtex['author'][0][0]
@@ -280,9 +272,13 @@ class Article:
         self.type        = self.bibtex['type']
         # Replace ADS mirror with main page for inclusion in bibtex file
         try:
-            self.url     = self.bibtex['url'] = self.bibtex['adsurl'] = \
-                            self.bibtex['adsurl'].replace(self.ads_mirror,
-                                                          'adsabs.harvard.edu')
+            adsurl = self.bibtex['adsurl']
+            mirrors = ADS_MIRRORS
+            if self.ads_client is not None:
+                mirrors = self.ads_client.mirrors
+            for mirror in [self.ads_mirror] + mirrors:
+                adsurl = adsurl.replace(mirror, 'adsabs.harvard.edu')
+            self.url     = self.bibtex['url'] = self.bibtex['adsurl'] = adsurl
         except KeyError:
             self.url     = ""
         self.year        = self.bibtex['year']
@@ -294,202 +290,133 @@ class Article:
 
     def _rename_file(self):
         """
-        Rename the pdf following a specific pattern
+        Rename the pdf following a specific pattern, and update the path
 
         Authur - Year - ADS bibcode - Title.pdf
         """
+        new_path = ''.join([os.path.split(self.path)[0],
+                            '/',
+                            ' - '.join([_latex_to_text(self.author),
+                                        self.reference,
+                                        _latex_to_text(self.title)  ]),
+                            '.pdf'
+                            ])
         print(self.path)
-        print(''.join(['  --> ', os.path.split(self.path)[0],
-                       '/',
-                       ' - '.join([_latex_to_text(self.author),
-                                   self.reference,
-                                   _latex_to_text(self.title)]),
-                       '.pdf',
-                       '\n'
-                       ]))
-        os.rename(self.path,
-                  ''.join([os.path.split(self.path)[0],
-                           '/',
-                           ' - '.join([_latex_to_text(self.author),
-                                       self.reference,
-                                       _latex_to_text(self.title)  ]),
-                           '.pdf'
-                           ]))
-
-
-def _parse_bibtex_entry(bib_list):
+        print(''.join(['  --> ', new_path, '\n']))
+        start = time.time()
+        os.rename(self.path, new_path)
+        if self.stats is not None:
+            self.stats.add_time('rename', time.time() - start)
+        self.path = new_path
+
+
+
+def _ads_client():
+    """
+    Get Article.ads_client, creating the default client if it is not set
+
+    Returns
+    -------
+    bibtex.ads.ADSClient
+        The HTTP client for ADS
+    """
+    if Article.ads_client is None:
+        from bibtex.ads import ADSClient
+        Article.ads_client = ADSClient()
+    return Article.ads_client
+
+
+def _ads_query_url(ads_mirror, key, values, quoted=True):
     """
-    Parse the text of a bibtex entry for an article and return a dictionary
+    Get a URL of the BibTeX entries for one or more papers at ADS
 
     Parameters
     ----------
-    bib_list : list of strings
-        The bibtex entry to parse
+    ads_mirror : string
+        The ADS mirror to query
+    key : string
+        The type of the values, 'bibcode' or 'doi'
+    values : list of strings
+        The bibcodes or DOIs of the papers
+    quoted : bool, optional
+        URL encode the values (default: True)
 
     Returns
     -------
-    dictionary
-        A dictionary of bibtex key : value pairs
+    string
+        A URL that can be resolved to find the BibTeX entries
     """
-    bib_dict = {}
-    last_key = None
-    for line in bib_list:
-        line_list = line.split()
-        try:
-            if line_list[1] == '=':  # If the start of key = value pair
-                bib_dict[line_list[0]] = line_list[2:]
-                last_key = line_list[0]
-            else:
-                raise IndexError
-        except IndexError:  # If not the start of a key = value pair
-            if line[0] == '@':
-                # Determine bibtex entry definition line properties
-                bib_dict['type'] = [
-                        re.search(r'(?<=@)'  # preceded by @
-                                  r'.*'      # matches anything
-                                  r'(?={)',  # followed by {
-                                  line
-                                  ).group().lower()
-                                    ]
-                bib_dict['reference'] = [
-                        re.search(r'(?<={)'  # preceded by {
-                                  r'.*'      # matches anything
-                                  r'(?=,)' ,  # followed by ,
-                                  line
-                                  ).group()
-                                         ]
-            else:
-                # Add line to value of last defined key
-                bib_dict[last_key] += line_list
-    # Remove last } of entry
-    bib_dict[last_key] = ''.join( \
-                ' '.join(bib_dict[last_key]).rsplit('}', 1)).split()
-
-    # All bibtex keys are now dictionary keys
-    # Need to remove { " , from beginning/end of bib_dict values
-    for key in bib_dict:
-        bib_dict[key] = ' '.join(bib_dict[key])
-        if bib_dict[key][-1] == ',':
-            bib_dict[key] = bib_dict[key][:-1]
-        while True:
-            count = 0
-            len_greater_than_0 = 0
-            for character in bib_dict[key]:
-                if count > 0:
-                    len_greater_than_0 += 1
-                if character == '{':
-                    count += 1
-                elif character == '}':
-                    count -= 1
-            try:
-                if ((bib_dict[key][0] == '"' and bib_dict[key][-1] == '"')
-                        or
-                        len_greater_than_0 == (len(bib_dict[key]) - 1)    ):
-                    bib_dict[key] = bib_dict[key][1:-1]
-                else:
-                    raise IndexError
-            except IndexError:
-                break
-
-    # Now parse authors into a tuple of tuples
-    # This is hardcoded for ADS braces format
-    authors = []
-    # Authors separated by ' and '
-    # Example author: {Ivezi{\'c}}, {\v Z}.~R.
-    for author in bib_dict['author'].split(' and '):
-        if author == '\n':
-            continue
+    if quoted:
         try:
-            name = [re.search(r'(?<=\{).+(?=\},)', author).group(0)]
-            initials = re.search(r'(?<=\},).*', author).group(0).split('.')
-            for initial in initials:
-                stripped = initial.strip('~' + whitespace)
-                if stripped != '':
-                    name.append(stripped)
-        except AttributeError:
-            try:
-                name = [re.search(r'(?<=\{).+(?=\})', author).group(0)]
-            except AttributeError:  # likely et al.
-                name = [author]
-        authors.append(tuple(name))
-    bib_dict['author'] = tuple(authors)
-
-    return bib_dict
-
-
-def _format_journal(journal):
+            from urllib.parse import quote
+        except ImportError:
+            from urllib import quote
+        values = [quote(value) for value in values]
+    return ''.join(['http://', ads_mirror,
+                    '/cgi-bin/nph-bib_query?']
+                   + ['&{0}={1}'.format(key, value) for value in values]
+                   + ['&data_type=BIBTEX&db_key=AST&nocookieset=1'])
+
+
+def _pdf_to_text(path):
     """
-    Convert ADS journal codes into names suitable for use in references
+    Convert the first page of a pdf to text with pdftotext
+
+    The text is read from the output of pdftotext, so calls can run
+    concurrently. If Article.text_cache is set, the text is cached by the
+    content of the pdf, so a pdf is only converted once even if it is renamed.
 
     Parameters
     ----------
-    journal: string
-        An ADS BibTeX journal code eg '\apj'
+    path : string
+        A path to a pdf
 
     Returns
     -------
-    string
-        The formatted version of a journal name eg 'ApJ'
+    list of strings
+        The lines of text on the first page of the pdf
     """
-    journals = {
-        r'\aap': r'A\&A',
-        r'\aaps': r'A\&AS',
-        r'\aj': 'AJ',
-        r'\apj': 'ApJ',
-        r'\apjl': 'ApJL',
-        r'\apjs': 'ApJS',
-        r'\araa': r'ARA\&A',
-        'ArXiv e-prints': 'arXiv',
-        r'\mnras': 'MNRAS',
-        r'\nat': 'Nature',
-        r'\pasj': 'PASJ',
-        r'\pasp': 'PASP',
-        r'\physrep': 'Phys. Rep.',
-        r'\prd': 'PhRvD',
-    }
-    if journal in journals:
-        return journals[journal]
-    return journal
-
-
-def _latex_to_text(latex):
+    cache = Article.text_cache
+    if cache is not None:
+        key = ('text', _pdf_content_hash(path, cache))
+        text = cache.get(key)
+        if text is not None:
+            return io.StringIO(text).readlines()
+    import subprocess
+    pdftotext = subprocess.Popen(['pdftotext', '-l', '1', path, '-'],
+                                 shell=False, stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+    text = pdftotext.communicate()[0].decode('utf-8', 'replace')
+    if cache is not None and pdftotext.returncode == 0:
+        cache.set(key, text)
+    return io.StringIO(text, newline=None).readlines()
+
+
+def _pdf_content_hash(path, cache):
     """
-    Convert a string with latex characters to a standard character set
+    Get a hash of the content of a pdf
+
+    The hash is cached by the device, inode, size and modification time of
+    the file, so it is only calculated again if the file has changed.
 
     Parameters
     ----------
-    latex : string
-        A string containing possible LaTeX encodings eg 'H$_{2}$O'
+    path : string
+        A path to a pdf
+    cache : bibtex.cache.Cache
+        The cache to keep hashes in
 
     Returns
     -------
     string
-        A string converted to a standard format eg H20
+        The SHA-1 hash of the pdf
     """
-    # Set out a list of conversions (list preserves order - req. for \ etc)
-    conversions = [[[r'\ss'], 'ß'],
-                   [[r'\times'], '✕'],
-                   [[r'\alpha'], 'α'],
-                   [[r'\beta'], 'β'],
-                   [[r'\mu'], 'μ'],
-                   [[r'\gt'], '>'],
-                   [[r'\lt'], '<'],
-                   [[r'\~{n}', r'\~n'], 'ñ'],
-                   [[r'\l'], 'ł'],
-                   [[r'\o'], 'ø'],
-                   [[r'\v s'], 'š'],
-                   [[r'\~', r'\tilde'], '~'],
-                   [[r'\ndash'], '--'],
-                   [[r'\mdash'], '---'],
-                   [[r'\&'], '&'],
-                   [[r"\'a"], 'á'],
-                   [[r"\'e"], 'é'],
-                   [[r'\"o'], 'ö'],
-                   [[r'\"u'], 'ü'],
-                   [[r'\"', r"\'", "'", '`',
-                     '{', '}','$', '/', '^', '_', '\\'], '']
-                  ]
-    for conversion in conversions:
-        for key in conversion[0]:
-            latex = latex.replace(key, conversion[1])
-    return latex
+    stat = os.stat(path)
+    key = ('stat', '{0}:{1}:{2}:{3!r}'.format(stat.st_dev, stat.st_ino,
+                                               stat.st_size, stat.st_mtime))
+    content_hash = cache.get(key)
+    if content_hash is None:
+        content_hash = file_hash(path)
+        cache.set(key, content_hash)
+    return content_hash
+
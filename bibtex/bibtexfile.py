@@ -1,10 +1,49 @@
-import os
+import bisect, hashlib, io, locale, os, re, sqlite3, time
 
 from bibtex.article import Article
+from bibtex.entry import (LazyArticle, _normalise_arxiv, _normalise_doi,
+                          _parse_bibtex_entry)
+from bibtex.search import SearchIndex
+from bibtex.snapshot import (load_snapshot, prune_snapshots, save_snapshot,
+                             snapshot_path)
 
-class BibtexFile:
 
-    def __init__(self, path=None):
+# Entry types that do not describe an article
+_NON_ARTICLE_ENTRIES = ('comment', 'preamble', 'string')
+# The start of an entry eg '@ARTICLE{'
+_ENTRY_START_RE = re.compile(r'\s*@\s*([A-Za-z]+)')
+# Characters that delimit values (an escaped quote is matched so it is skipped)
+_DELIMITER_RE = re.compile(r'\\"|[{}"]')
+# The reference of an entry eg '@ARTICLE{2012ApJ...745....1S,'
+_ENTRY_REFERENCE_RE = re.compile(r'\s*@\s*[A-Za-z]+\s*\{\s*([^,\s]+)')
+# A file parsed in several processes is split into this many chunks for
+# each process, so that the processes finish at about the same time
+_CHUNKS_PER_PROCESS = 4
+# Entries are written to the file in groups of this many
+_WRITE_BATCH_SIZE = 256
+# The number of bytes at the end of an indexed file that are hashed, to tell
+# if it has only been appended to since
+_INDEX_TAIL_SIZE = 4096
+# The permissions of new files are masked by the umask, read once as it can
+# only be read by changing it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class BibtexFile(object):
+
+    # Directory to keep snapshots of the parsed entries of imported files in,
+    # so that unchanged files are not parsed again (None = do not keep them,
+    # eg default_cache_path('snapshots') as pdftobib, mnbib and bibserve use)
+    snapshot_dir = None
+    # The most bytes of snapshots to keep in snapshot_dir, the least recently
+    # used are removed first
+    snapshot_max_bytes = 256 * 1024 * 1024
+    # Number of processes parsing the entries of a file as it is imported
+    # (1 = parse them in this process)
+    processes = 1
+
+    def __init__(self, path=None, index=False, lazy=False):
         """
         Constructor, optionally imports from a specified bibtex file
 
@@ -12,18 +51,188 @@ class BibtexFile:
         ----------
         path : string, optional
             The path to a bibtex file to import (default: None = self.path)
+        index : bool, optional
+            Index the entries of the file (see BibtexIndex) instead of
+            importing them, so that get reads and parses only the entry asked
+            for. All of the entries are imported the first time they are
+            needed, eg by articles or write_to_file (default: False)
+        lazy : bool, optional
+            Create a LazyArticle for each entry read from a file instead of an
+            Article, which takes less memory and only parses the entry when it
+            is needed. Snapshots are not used (default: False)
         """
         self.path = path
+        self.lazy = lazy
+        # Index of the file at self.path while its Articles are not imported
+        self._entry_index = None
+        self._indexed_articles = {}  # reference : Article read using the index
         self.articles = []  # List of Articles
+        # (size, modification time) of the file at self.path when it was
+        # last read or written, and the references of its entries in order
+        self._file_state = None
         if os.path.isfile(str(path)):
-            self.import_articles_from_file()
+            if index:
+                try:
+                    self._entry_index = BibtexIndex(path)
+                except sqlite3.Error:
+                    # The index cannot be written eg a read only directory
+                    index = False
+            if not index:
+                self.import_articles_from_file()
 
     def __contains__(self, item):
         """
         Returns item (a reference) in the list of article references in self
         """
-        return repr(item) in [repr(article.reference)
-                              for article in self.articles]
+        return item in self._references or (self._entry_index is not None and
+                                            item in self._entry_index)
+
+
+    @property
+    def articles(self):
+        """
+        The list of Articles in the BibtexFile
+        """
+        if self._entry_index is not None:
+            self._import_indexed_articles()
+        return self._articles
+
+
+    @articles.setter
+    def articles(self, articles):
+        """
+        Replace the list of Articles, rebuilding the lookup indexes
+        """
+        if self._entry_index is not None:
+            self._entry_index.close()
+            self._entry_index = None
+        self._articles = articles
+        self._rebuild_index()
+
+
+    def _import_indexed_articles(self):
+        """
+        Import the Articles of an indexed file, before any that have been
+        appended since it was indexed
+        """
+        appended = self._articles
+        self._entry_index.close()
+        self._entry_index = None
+        self._indexed_articles = {}
+        self._articles = []
+        self._rebuild_index()
+        self.import_articles_from_file()
+        for article in appended:
+            self._articles.append(article)
+            self._index_article(article)
+
+
+    def _rebuild_index(self):
+        """
+        Rebuild the reference, DOI and arXiv lookup indexes from self.articles
+        """
+        self._references = {}  # reference : Article
+        # The DOI and arXiv indexes are built when first needed, as they need
+        # the fields of each entry (None = not built)
+        self._dois = None      # normalised DOI : Article
+        self._eprints = None   # normalised arXiv identifier : Article
+        # The search index is built when first searched (None = not built)
+        self._search_index = None
+        # (index name, key) of the keys more than one Article has, so the
+        # next Article with the key is found when the first is removed
+        self._shadowed = set()
+        for article in self._articles:
+            self._index_article(article)
+
+
+    def _index_article(self, article):
+        """
+        Add an Article to the lookup indexes (the first entry for a key wins)
+
+        Parameters
+        ----------
+        article : Article or LazyArticle
+            The Article to index
+        """
+        for name, index, key in self._lookup_keys(article):
+            if index.setdefault(key, article) is not article:
+                self._shadowed.add((name, key))
+        if self._search_index is not None:
+            self._search_index.add(article)
+
+
+    def _unindex_article(self, article):
+        """
+        Remove an Article from the lookup indexes, replacing it with the next
+        Article with the same key if there is one
+
+        Parameters
+        ----------
+        article : Article or LazyArticle
+            The Article to remove, already removed from self._articles
+        """
+        for name, index, key in self._lookup_keys(article):
+            if index.get(key) is not article:
+                continue
+            del index[key]
+            if (name, key) not in self._shadowed:
+                continue
+            for other in self._articles:
+                if any(other_name == name and other_key == key
+                       for other_name, other_index, other_key
+                       in self._lookup_keys(other)):
+                    index[key] = other
+                    break
+            else:
+                self._shadowed.discard((name, key))
+        # The search index does not remove Articles, build it again if needed
+        self._search_index = None
+
+
+    def _lookup_keys(self, article):
+        """
+        Get the lookup indexes that have been built and the key of an Article
+        in each
+
+        Returns
+        -------
+        list of tuples: 3 elements, (string, dictionary, string)
+            The name of each index ('reference', 'doi' or 'arxiv'), the index,
+            and the key of the Article in it
+        """
+        keys = [('reference', self._references, article.reference)]
+        if self._dois is None:
+            return keys
+        bibtex = getattr(article, 'bibtex', {})
+        if bibtex.get('doi'):
+            keys.append(('doi', self._dois, _normalise_doi(bibtex['doi'])))
+        if bibtex.get('eprint'):
+            keys.append(('arxiv', self._eprints,
+                         _normalise_arxiv(bibtex['eprint'])))
+        return keys
+
+
+    def _build_identifier_indexes(self):
+        """
+        Build the DOI and arXiv lookup indexes, if they have not been
+        """
+        if self._entry_index is not None:
+            self._import_indexed_articles()
+        if self._dois is None:
+            self._dois = {}
+            self._eprints = {}
+            for article in self._articles:
+                self._index_article(article)
+
+
+    def _article_class(self):
+        """
+        Get the class of the Articles created from entries, Article or
+        LazyArticle
+        """
+        if self.lazy:
+            return LazyArticle
+        return Article
 
 
     def append(self, item):
@@ -32,21 +241,131 @@ class BibtexFile:
 
         Parameters
         ----------
-        item : Article
+        item : Article or LazyArticle
             The Article to append
         """
-        if type(item) is Article:
-            self.articles.append(item)
+        if isinstance(item, (Article, LazyArticle)):
+            self._articles.append(item)
+            self._index_article(item)
         else:
             raise TypeError
 
 
+    def remove(self, reference):
+        """
+        Remove the Article with a given reference from the BibtexFile
+
+        Parameters
+        ----------
+        reference : string
+            The reference (ADS bibcode) of the Article to remove
+
+        Returns
+        -------
+        Article
+            The Article that was removed
+        """
+        article = self.get(reference)
+        if self._entry_index is not None:
+            self._import_indexed_articles()
+            article = self.get(reference)
+        self._articles.remove(article)
+        self._unindex_article(article)
+        return article
+
+
     def get(self, reference):
         """
+        Get the Article with a given reference
+
+        Parameters
+        ----------
+        reference : string
+            The reference (ADS bibcode) of the Article
+
+        Returns
+        -------
+        Article
+            The first Article in the BibtexFile with that reference
+        """
+        try:
+            return self._references[reference]
+        except KeyError:
+            pass
+        if self._entry_index is not None:
+            if reference not in self._indexed_articles:
+                bibtex = self._entry_index.read(reference)
+                if bibtex is not None:
+                    self._indexed_articles[reference] = \
+                                        self._article_class()(bibtex=bibtex)
+            if reference in self._indexed_articles:
+                return self._indexed_articles[reference]
+        raise ValueError('{0} is not in the BibtexFile'.format(reference))
+
+
+    def get_by_doi(self, doi):
+        """
+        Get the Article with a given DOI
+
+        Parameters
+        ----------
+        doi : string
+            The DOI of the Article
+
+        Returns
+        -------
+        Article
+            The first Article in the BibtexFile with that DOI
+        """
+        self._build_identifier_indexes()
+        try:
+            return self._dois[_normalise_doi(doi)]
+        except KeyError:
+            raise ValueError('{0} is not in the BibtexFile'.format(doi))
+
+
+    def get_by_arxiv(self, eprint):
+        """
+        Get the Article with a given arXiv identifier
+
+        Parameters
+        ----------
+        eprint : string
+            The arXiv identifier of the Article eg '1201.4773'
+
+        Returns
+        -------
+        Article
+            The first Article in the BibtexFile with that arXiv identifier
+        """
+        self._build_identifier_indexes()
+        try:
+            return self._eprints[_normalise_arxiv(eprint)]
+        except KeyError:
+            raise ValueError('{0} is not in the BibtexFile'.format(eprint))
+
+
+    def search(self, query):
         """
-        references = [repr(article.reference) for article in self.articles]
-        return self.articles[references.index(repr(reference))]
+        Find the Articles that match a query, by author, title, journal and
+        year
 
+        Parameters
+        ----------
+        query : string
+            The query eg 'author:Ivezi* year:2005-2010', see bibtex.search
+
+        Returns
+        -------
+        list of Articles
+            The Articles that match, in the order they were added
+        """
+        if self._entry_index is not None:
+            self._import_indexed_articles()
+        if self._search_index is None:
+            self._search_index = SearchIndex(self._articles)
+        return [self._references[reference] for reference in
+                _unique(self._search_index.search(query))]
 
 
     def import_articles_from_file(self, path=None):
@@ -60,59 +379,804 @@ class BibtexFile:
         """
         if path is None:
             path = self.path
-        # Get all lines from file
+        if self.lazy or (self.snapshot_dir is None and self.processes < 2):
+            articles = self.iter_articles(path)
+        else:
+            articles = self._iter_parsed_articles(path)
+        references = []
+        for article in articles:
+            self._articles.append(article)
+            self._index_article(article)
+            references.append(article.reference)
+        if path == self.path:
+            self._file_state = (_file_signature(self.path), references)
+
+
+    def _iter_parsed_articles(self, path):
+        """
+        Yield an Article for each entry of a bibtex file, from the snapshot of
+        its parsed entries if it is unchanged, otherwise parsing it (in
+        self.processes processes) and then taking a snapshot
+
+        Parameters
+        ----------
+        path : string
+            The path to the bibtex file
+
+        Yields
+        ------
+        Article
+            An Article for each entry in the file, in file order
+        """
+        entries = None
+        parsed = None  # The parsed entries to take a snapshot of
+        if self.snapshot_dir is not None:
+            location = snapshot_path(self.snapshot_dir, path)
+            entries = load_snapshot(location, path)
+        if entries is None:
+            before = _file_signature(path)
+            entries = _iter_parsed_entries(path, self.processes)
+            if self.snapshot_dir is not None:
+                parsed = []
+        for entry in entries:
+            if parsed is not None:
+                parsed.append(entry)
+            article = Article()
+            # import_from_dict changes the dictionary, not the values in it
+            article.import_from_dict(dict(entry))
+            yield article
+        if parsed is not None and _file_signature(path) == before:
+            try:
+                save_snapshot(location, path, parsed)
+                prune_snapshots(self.snapshot_dir, self.snapshot_max_bytes)
+            except (IOError, OSError):
+                pass
+
+
+    def iter_articles(self, path=None):
+        """
+        Read a bibtex file one entry at a time, yielding an Article for each
+
+        @string, @comment and @preamble blocks are skipped, as is any text
+        between entries.
+
+        Parameters
+        ----------
+        path : string, optional
+            The path to a bibtex file to read (default: None = self.path)
+
+        Yields
+        ------
+        Article or LazyArticle
+            An Article for each entry in the file, in file order
+        """
+        if path is None:
+            path = self.path
+        article_class = self._article_class()
         with open(path, 'r') as bib_file:
-            lines = bib_file.readlines()
-        count = 0
-        bibtex = []
-        new_article = False
-        for line in lines:
-            # Find lines to use for single entry
-            for character in line.strip():
-                if character == '{':
-                    new_article = True
-                    count += 1
-                elif character == '}':
-                    count -= 1
-            # Add line to this entry
-            if line != '\n':
-                bibtex.append(line)
-            # Entry over, construct Article and append to self.articles
-            if count < 1 and new_article:
-                self.articles.append(Article(bibtex=bibtex))
-                bibtex = []
-                new_article = False
-
-
-    def write_to_file(self, path=None):
-        """
-        Write a bibtex entry for all Articles to the file
+            for entry_type, bibtex in _iter_entries(bib_file):
+                if entry_type not in _NON_ARTICLE_ENTRIES:
+                    yield article_class(bibtex=bibtex)
+
+
+    def write_to_file(self, path=None, merge=False):
+        """
+        Write a bibtex entry for all Articles to the file, sorted by author and
+        year
+
+        The file is written to a temporary file which then replaces it, so it
+        is never left partly written.
+
+        Parameters
+        ----------
+        path : string, optional
+            The path to write to (default: None = self.path)
+        merge : bool, optional
+            If the file exists and its entries are already sorted, keep them
+            as they are and only insert the entries of Articles that are not
+            in the file, appending them to the end of the file if they all sort
+            after its last entry (default: False = rewrite every entry)
+
+        Returns
+        -------
+        tuple: 2 elements, (int, float)
+            The number of bytes written and the time taken in seconds
         """
+        start = time.time()
         # Sort by author, year
-        self.articles.sort(key=lambda article: (article.author, article.year))
-        if path:
+        self.articles.sort(key=_sort_key)
+        if path and path != self.path:
             self.path = path
-        with open(self.path, 'w') as bib_file:
-            for article in self.articles:
-                # Write first line of bibtex (@article{reference, etc)
-                bib_file.write('@{0}{{{1},\n'.format(article.type,
-                                                     article.reference))
-                # Author list needs some special formatting
-                authors = []
-                for author in article.authors:
-                    formatted_author = ['{', author[0], '}']
-                    try:
-                        formatted_author += [', ', author[1], '.']
-                        for initial in author[2:]:
-                            formatted_author += ['~', initial, '.']
-                    except IndexError:
-                        pass
-                    authors.append(''.join(formatted_author))
-                bib_file.write('author = {' + ' and '.join(authors) + '},\n')
-
-                # Write other keys
-                for key in article.bibtex:
-                    if key != 'author':
-                        bib_file.write(''.join([key, ' = {',
-                                                article.bibtex[key], '},\n']))
-                bib_file.write('}\n\n')
+            self._file_state = None
+        written = None
+        if merge and os.path.isfile(self.path):
+            written = self._merge_into_file()
+        if written is None:
+            written = _write_atomically(self.path,
+                                        (_format_entry(article)
+                                         for article in self.articles))
+            self._file_state = (_file_signature(self.path),
+                                [article.reference
+                                 for article in self.articles])
+        return written, time.time() - start
+
+
+    def _merge_into_file(self):
+        """
+        Insert the entries of Articles that are not in the file into it, in
+        sorted order, keeping the existing entries as they are
+
+        Returns
+        -------
+        int or None
+            The number of bytes written, or None if the entries in the file are
+            not sorted (or are not all in the BibtexFile), so it must be
+            rewritten
+        """
+        if (self._file_state is not None and
+                self._file_state[0] == _file_signature(self.path)):
+            references = self._file_state[1]
+        else:
+            # The file has changed since it was read
+            references = []
+            with open(self.path, 'r') as bib_file:
+                for entry_type, lines in _iter_entries(bib_file):
+                    if entry_type in _NON_ARTICLE_ENTRIES:
+                        continue
+                    reference = _ENTRY_REFERENCE_RE.match(lines[0])
+                    if reference is None:
+                        return None
+                    references.append(reference.group(1))
+        if not all(reference in self._references
+                   for reference in references):
+            return None
+        keys = [_sort_key(self._references[reference])
+                for reference in references]
+        if any(keys[index] < keys[index - 1]
+               for index in range(1, len(keys))):
+            return None
+        in_file = set(references)
+        new_articles = [article for article in self.articles
+                        if article.reference not in in_file]
+        if not new_articles:
+            return 0
+        # The entry in the file each new Article is inserted before
+        positions = [bisect.bisect_right(keys, _sort_key(article))
+                     for article in new_articles]
+        if positions[0] == len(references):
+            written = _append(self.path, (_format_entry(article)
+                                          for article in new_articles))
+        else:
+            with open(self.path, 'r') as bib_file:
+                lines = bib_file.readlines()
+            starts = _entry_start_lines(lines, references)
+            if starts is None:
+                return None
+            written = _write_atomically(
+                        self.path,
+                        _merge_entries(lines, starts, positions, new_articles))
+        merged = []
+        previous = 0
+        for position, article in zip(positions, new_articles):
+            merged += references[previous:position]
+            merged.append(article.reference)
+            previous = position
+        merged += references[previous:]
+        self._file_state = (_file_signature(self.path), merged)
+        return written
+
+
+class BibtexIndex(object):
+
+    def __init__(self, bib_path, path=None):
+        """
+        An index of where each entry is in a bibtex file (its byte offset and
+        length), kept in an SQLite database next to the file, so that an entry
+        can be read without parsing the whole file
+
+        The index is updated when it is opened: if the file has only been
+        appended to since it was indexed, only the new entries are scanned,
+        otherwise the whole file is scanned again (the entries are found by
+        counting braces, they are not parsed). Where a reference is in the file
+        more than once, the first entry is indexed.
+
+        Parameters
+        ----------
+        bib_path : string
+            The path to the bibtex file
+        path : string, optional
+            The path to the index database (default: None = bib_path with
+            '.index' appended)
+        """
+        self.bib_path = bib_path
+        if path is None:
+            path = bib_path + '.index'
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                                     ' reference TEXT PRIMARY KEY,'
+                                     ' offset INTEGER,'
+                                     ' length INTEGER)')
+            # size, mtime, tail (hash) and scanned (offset) of the file
+            self._connection.execute('CREATE TABLE IF NOT EXISTS file ('
+                                     ' key TEXT PRIMARY KEY,'
+                                     ' value TEXT)')
+        self.update()
+
+
+    def __contains__(self, reference):
+        """
+        Returns whether reference is in the index
+        """
+        return self.lookup(reference) is not None
+
+
+    def __len__(self):
+        """
+        Returns the number of entries in the index
+        """
+        return self._connection.execute(
+                            'SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+    def lookup(self, reference):
+        """
+        Get where the entry for a reference is in the file
+
+        Parameters
+        ----------
+        reference : string
+            The reference (ADS bibcode) of the entry
+
+        Returns
+        -------
+        tuple: 2 elements, (int, int) or None
+            The byte offset and length of the entry, or None if it is not in
+            the file
+        """
+        return self._connection.execute(
+                        'SELECT offset, length FROM entries WHERE reference = ?',
+                        (reference,)).fetchone()
+
+
+    def read(self, reference):
+        """
+        Read the entry for a reference from the file
+
+        Parameters
+        ----------
+        reference : string
+            The reference (ADS bibcode) of the entry
+
+        Returns
+        -------
+        list of strings or None
+            The lines of the entry, as read from the file by _iter_entries,
+            or None if it is not in the file
+        """
+        for attempt in range(2):
+            span = self.lookup(reference)
+            if span is None:
+                return None
+            with open(self.bib_path, 'rb') as bib_file:
+                bib_file.seek(span[0])
+                lines = _decode_lines(bib_file.read(span[1]))
+            found = _ENTRY_REFERENCE_RE.match(lines[0]) if lines else None
+            if found is not None and found.group(1) == reference:
+                return [line for line in lines if line.strip()]
+            # The file has changed without its size or modification time
+            # changing, so it must be indexed again
+            self.update(rescan=True)
+        return None
+
+
+    def update(self, rescan=False):
+        """
+        Bring the index up to date with the file
+
+        Parameters
+        ----------
+        rescan : bool, optional
+            Scan the whole file, even if it has not changed since it was last
+            indexed (default: False)
+        """
+        stat = os.stat(self.bib_path)
+        indexed = dict(self._connection.execute('SELECT key, value FROM file'))
+        if (not rescan and indexed.get('size') == str(stat.st_size) and
+                indexed.get('mtime') == repr(stat.st_mtime)):
+            return
+        start = 0
+        if (not rescan and indexed and
+                stat.st_size >= int(indexed['size']) and
+                _tail_hash(self.bib_path, int(indexed['size']))
+                == indexed['tail']):
+            # Only appended to, scan from the end of the last entry
+            start = int(indexed['scanned'])
+        with self._connection:
+            if start == 0:
+                self._connection.execute('DELETE FROM entries')
+            scanned = start
+            rows = []
+            with open(self.bib_path, 'rb') as bib_file:
+                bib_file.seek(start)
+                # Decode as latin-1 so offsets in characters are in bytes
+                lines = (line.decode('latin-1') for line in bib_file)
+                for entry_type, entry, entry_start, entry_end \
+                        in _iter_entry_spans(lines):
+                    scanned = start + entry_end
+                    if entry_type in _NON_ARTICLE_ENTRIES:
+                        continue
+                    reference = _ENTRY_REFERENCE_RE.match(entry[0])
+                    if reference is not None:
+                        rows.append((_decode_lines(
+                                        reference.group(1).encode('latin-1')
+                                                   )[0],
+                                     start + entry_start,
+                                     entry_end - entry_start))
+            self._connection.executemany(
+                        'INSERT OR IGNORE INTO entries VALUES (?, ?, ?)', rows)
+            self._connection.executemany(
+                        'INSERT OR REPLACE INTO file VALUES (?, ?)',
+                        [('size', str(stat.st_size)),
+                         ('mtime', repr(stat.st_mtime)),
+                         ('tail', _tail_hash(self.bib_path, stat.st_size)),
+                         ('scanned', str(scanned))])
+
+
+    def close(self):
+        """
+        Close the index database
+        """
+        self._connection.close()
+
+
+def _iter_entries(lines):
+    """
+    Split the lines of a bibtex file into entries in a single pass
+
+    Braces are counted to find the end of each entry, a brace inside a quoted
+    value cannot close the entry, and text outside of an entry is ignored.
+
+    Parameters
+    ----------
+    lines : iterable of strings
+        The lines of a bibtex file (eg an open file)
+
+    Yields
+    ------
+    tuple: 2 elements, (entry type, list of strings)
+        The lower case entry type eg 'article' and the lines of the entry
+    """
+    for entry_type, entry, start, end in _iter_entry_spans(lines):
+        yield entry_type, entry
+
+
+def _iter_entry_spans(lines):
+    """
+    Split the lines of a bibtex file into entries, as _iter_entries, also
+    finding where each entry is in the text
+
+    Parameters
+    ----------
+    lines : iterable of strings
+        The lines of a bibtex file
+
+    Yields
+    ------
+    tuple: 4 elements, (entry type, list of strings, int, int)
+        The lower case entry type, the lines of the entry, and the offsets of
+        the start of its first line and the end of its last line, counted in
+        characters from the first of lines
+    """
+    entry_type = None
+    position = 0
+    for line in lines:
+        line_start = position
+        position += len(line)
+        if entry_type is None:
+            match = _ENTRY_START_RE.match(line)
+            if match is None:
+                continue
+            entry_type = match.group(1).lower()
+            entry = []
+            start = line_start
+            depth = 0
+            opened = quoted = False
+        if line.strip():
+            entry.append(line)
+        for delimiter in _DELIMITER_RE.findall(line):
+            if delimiter == '{':
+                depth += 1
+                opened = True
+            elif delimiter == '}':
+                if quoted and depth == 1:
+                    continue
+                depth -= 1
+                if depth == 0:
+                    break
+            elif delimiter == '"' and depth == 1:
+                quoted = not quoted
+        if opened and depth < 1:
+            # Entry over
+            yield entry_type, entry, start, position
+            entry_type = None
+        elif not opened and entry_type == 'comment':
+            # An old style @comment runs to the end of the line
+            entry_type = None
+
+
+def _iter_parsed_entries(path, processes=1):
+    """
+    Parse the entries of a bibtex file, as _parse_bibtex_entry, yielding each
+
+    With more than one process, the file is split into chunks at lines that
+    start an entry, and the chunks are parsed in a process pool. If a chunk
+    ends inside an entry (a line in a value starts with @), the whole file is
+    parsed in this process instead, so the result is always the same.
+
+    Parameters
+    ----------
+    path : string
+        The path to the bibtex file
+    processes : int, optional
+        The number of processes to parse the file in (default: 1)
+
+    Yields
+    ------
+    dictionary
+        Each parsed entry, in file order
+    """
+    chunks = []
+    if processes > 1:
+        chunks = _chunk_file(path, processes * _CHUNKS_PER_PROCESS)
+    if len(chunks) > 1:
+        # Only imported when it is used, as it takes longer than the rest of
+        # the offline core
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            parsed = pool.map(_parse_chunk, [(path, start, end)
+                                             for start, end in chunks])
+        finally:
+            pool.close()
+            pool.join()
+        if all(complete for chunk_entries, complete in parsed):
+            for chunk_entries, complete in parsed:
+                for entry in chunk_entries:
+                    yield entry
+            return
+    with open(path, 'r') as bib_file:
+        for entry_type, bibtex in _iter_entries(bib_file):
+            if entry_type not in _NON_ARTICLE_ENTRIES:
+                yield _parse_bibtex_entry(bibtex)
+
+
+def _chunk_file(path, count):
+    """
+    Split a file into about count chunks of similar size, which start at the
+    start of the file or a line that starts with @
+
+    Returns
+    -------
+    list of tuples: 2 elements, (int, int)
+        The offsets of the start and end of each chunk, in bytes
+    """
+    size = os.path.getsize(path)
+    starts = [0]
+    with open(path, 'rb') as bib_file:
+        for chunk in range(1, count):
+            position = max(size * chunk // count, starts[-1])
+            bib_file.seek(position)
+            if position > 0:
+                # Skip to the start of the next line
+                position += len(bib_file.readline())
+            for line in iter(bib_file.readline, b''):
+                if line.lstrip()[:1] == b'@':
+                    break
+                position += len(line)
+            if starts[-1] < position < size:
+                starts.append(position)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _parse_chunk(chunk):
+    """
+    Parse the entries in a chunk of a bibtex file, in a process pool
+
+    Parameters
+    ----------
+    chunk : tuple: 3 elements, (string, int, int)
+        The path to the file, and the offsets of the start and end of the
+        chunk in bytes
+
+    Returns
+    -------
+    tuple: 2 elements, (list of dictionaries or None, bool)
+        The parsed entries, and whether the chunk ends outside an entry (so
+        that the next chunk is parsed as it would be in the whole file), or
+        (None, False) if an entry cannot be parsed
+    """
+    path, start, end = chunk
+    with open(path, 'rb') as bib_file:
+        bib_file.seek(start)
+        lines = _decode_lines(bib_file.read(end - start))
+    entries = []
+    last_end = 0
+    for entry_type, bibtex, entry_start, entry_end in _iter_entry_spans(lines):
+        last_end = entry_end
+        if entry_type not in _NON_ARTICLE_ENTRIES:
+            try:
+                entries.append(_parse_bibtex_entry(bibtex))
+            except Exception:
+                # Perhaps the chunk starts inside an entry, if not the error
+                # is raised when the file is parsed in one process
+                return None, False
+    # Any entry started after the last one ended has not ended in the chunk
+    complete = True
+    position = 0
+    for line in lines:
+        if position >= last_end and _ENTRY_START_RE.match(line):
+            complete = False
+        position += len(line)
+    return entries, complete
+
+
+def _unique(items):
+    """
+    Remove repeated items from a list, keeping the first of each
+    """
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
+
+
+def _sort_key(article):
+    """
+    Get the key Articles are sorted by in a file, (author, year)
+    """
+    return (article.author, article.year)
+
+
+def _format_entry(article):
+    """
+    Format the bibtex entry of an Article for writing to a file
+
+    Parameters
+    ----------
+    article : Article
+        The Article to format
+
+    Returns
+    -------
+    string
+        The bibtex entry, followed by a blank line
+    """
+    # First line of bibtex (@article{reference, etc)
+    entry = ['@{0}{{{1},\n'.format(article.type, article.reference)]
+    # Author list needs some special formatting
+    authors = []
+    for author in article.authors:
+        formatted_author = ['{', author[0], '}']
+        try:
+            formatted_author += [', ', author[1], '.']
+            for initial in author[2:]:
+                formatted_author += ['~', initial, '.']
+        except IndexError:
+            pass
+        authors.append(''.join(formatted_author))
+    entry.append('author = {' + ' and '.join(authors) + '},\n')
+    # Other keys
+    for key in article.bibtex:
+        if key != 'author':
+            entry += [key, ' = {', article.bibtex[key], '},\n']
+    entry.append('}\n\n')
+    return ''.join(entry)
+
+
+def _file_signature(path):
+    """
+    Get the (size, modification time) of a file, to tell if it has changed
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+def _entry_start_lines(lines, references):
+    """
+    Find the line each entry of a file starts on
+
+    Parameters
+    ----------
+    lines : list of strings
+        The lines of the file
+    references : list of strings
+        The references of the entries in the file, in order
+
+    Returns
+    -------
+    list of ints or None
+        The index of the first line of each entry, or None if the entries
+        are not all found in order
+    """
+    starts = []
+    for index, line in enumerate(lines):
+        if len(starts) == len(references):
+            break
+        if '@' not in line or line.lstrip()[:1] != '@':
+            continue
+        reference = _ENTRY_REFERENCE_RE.match(line)
+        if (reference is not None and
+                reference.group(1) == references[len(starts)]):
+            starts.append(index)
+    if len(starts) < len(references):
+        return None
+    return starts
+
+
+def _merge_entries(lines, starts, positions, articles):
+    """
+    Merge the lines of a sorted file with the entries of sorted Articles
+
+    Parameters
+    ----------
+    lines : list of strings
+        The lines of the file
+    starts : list of ints
+        The index of the first line of each entry in the file
+    positions : list of ints
+        The index of the entry in the file each Article is inserted before
+    articles : list of Articles
+        The Articles to insert
+
+    Yields
+    ------
+    string
+        The text of the merged file, in order
+    """
+    line = 0
+    for position, article in zip(positions, articles):
+        if position < len(starts):
+            end = starts[position]
+        else:
+            end = len(lines)
+        yield ''.join(lines[line:end])
+        if end == len(lines) and line < end and lines[-1][-1:] != '\n':
+            # Start the entry on a new line
+            yield '\n'
+        line = end
+        yield _format_entry(article)
+    yield ''.join(lines[line:])
+
+
+def _write_atomically(path, entries):
+    """
+    Write entries to a temporary file, then replace the file at path with it
+
+    The temporary file has a unique name in the same directory, so writers to
+    the same file do not share it, and the directory is synced after the
+    file is replaced, so the replacement survives a crash.
+
+    Parameters
+    ----------
+    path : string
+        The path to the file
+    entries : iterable of strings
+        The text to write
+
+    Returns
+    -------
+    int
+        The number of bytes written
+    """
+    # Only imported when writing, as it is slow to import
+    import tempfile
+    directory = os.path.dirname(path) or '.'
+    descriptor, temporary_path = tempfile.mkstemp(
+                    prefix=os.path.basename(path) + '.', suffix='.tmp',
+                    dir=directory)
+    try:
+        with os.fdopen(descriptor, 'w') as bib_file:
+            _write_batches(bib_file, entries)
+            bib_file.flush()
+            os.fsync(bib_file.fileno())
+            written = os.fstat(bib_file.fileno()).st_size
+        if os.path.exists(path):
+            mode = os.stat(path).st_mode & 0o7777
+        else:
+            # mkstemp creates the file readable only by its owner
+            mode = 0o666 & ~_UMASK
+        os.chmod(temporary_path, mode)
+        os.rename(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    _fsync_directory(directory)
+    return written
+
+
+def _fsync_directory(directory):
+    """
+    Sync a directory, so that a file renamed into it survives a crash
+    """
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:  # Directories cannot be opened on Windows
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:  # Not supported by some file systems
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def _append(path, entries):
+    """
+    Append entries to the end of a file
+
+    The entries are formatted before the file is opened and written at once,
+    so the existing contents of the file are never changed.
+
+    Parameters
+    ----------
+    path : string
+        The path to the file
+    entries : iterable of strings
+        The text to append
+
+    Returns
+    -------
+    int
+        The number of bytes written
+    """
+    text = ''.join(entries)
+    with open(path, 'rb') as bib_file:
+        bib_file.seek(0, 2)
+        if bib_file.tell() > 0:
+            bib_file.seek(-1, 2)
+            if bib_file.read(1) != b'\n':
+                # Start the first entry on a new line
+                text = '\n' + text
+    with open(path, 'a') as bib_file:
+        length = os.fstat(bib_file.fileno()).st_size
+        bib_file.write(text)
+        bib_file.flush()
+        os.fsync(bib_file.fileno())
+        return os.fstat(bib_file.fileno()).st_size - length
+
+
+def _write_batches(bib_file, entries):
+    """
+    Write entries to a file, joining them into groups of _WRITE_BATCH_SIZE
+    """
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == _WRITE_BATCH_SIZE:
+            bib_file.write(''.join(batch))
+            batch = []
+    if batch:
+        bib_file.write(''.join(batch))
+
+
+def _tail_hash(path, size):
+    """
+    Get the SHA-1 hash of the _INDEX_TAIL_SIZE bytes before size in a file
+    """
+    with open(path, 'rb') as bib_file:
+        bib_file.seek(max(0, size - _INDEX_TAIL_SIZE))
+        return hashlib.sha1(
+                    bib_file.read(min(size, _INDEX_TAIL_SIZE))).hexdigest()
+
+
+def _decode_lines(data):
+    """
+    Split bytes read from a bibtex file into lines, decoded as when the file
+    is opened with open(path, 'r')
+    """
+    if isinstance(data, str):
+        # Python 2, open reads bytes
+        return io.BytesIO(data).readlines()
+    return io.StringIO(data.decode(locale.getpreferredencoding(False)),
+                       newline=None).readlines()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import os, sqlite3, threading, time
+
+
+# The time in seconds an entry's last access is recorded to (at most a tenth of
+# the ttl), so that most reads do not write to the database
+_ACCESS_RESOLUTION = 3600.
+
+
+def default_cache_path(name):
+    """
+    Get the default path of a cache file in the user cache directory
+
+    Parameters
+    ----------
+    name : string
+        The file name of the cache eg 'ads.sqlite'
+
+    Returns
+    -------
+    string
+        The path to the cache file eg '~/.cache/bibtex/ads.sqlite'
+    """
+    cache_dir = os.environ.get('XDG_CACHE_HOME',
+                               os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_dir, 'bibtex', name)
+
+
+class Cache(object):
+
+    def __init__(self, path, ttl=None, max_entries=100000):
+        """
+        A persistent key : value cache, stored in an SQLite database
+
+        Entries older than ttl are expired, and the least recently used
+        entries are removed once there are more than max_entries. When an
+        entry was last used is only recorded to within an hour (or a tenth of
+        the ttl), so reading an entry used recently does not write.
+        The cache can be shared between threads.
+
+        Parameters
+        ----------
+        path : string
+            The path to the cache database, created if it does not exist
+        ttl : float, optional
+            The time to live of an entry in seconds (default: None = forever)
+        max_entries : int, optional
+            The maximum number of entries to keep (default: 100000)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._access_resolution = _ACCESS_RESOLUTION
+        if ttl is not None:
+            self._access_resolution = min(_ACCESS_RESOLUTION, ttl / 10.)
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # Writes are appended to a log, and synced only at checkpoints
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS cache ('
+                                     ' key TEXT PRIMARY KEY,'
+                                     ' value TEXT,'
+                                     ' created REAL,'
+                                     ' accessed REAL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS accessed'
+                                     ' ON cache (accessed)')
+        self._size = self._connection.execute(
+                            'SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+    def __contains__(self, key):
+        """
+        Returns whether an unexpired entry for key is in the cache
+        """
+        return self.get(key) is not None
+
+
+    def __len__(self):
+        """
+        Returns the number of entries in the cache
+        """
+        return self._size
+
+
+    def get(self, key, expired=False):
+        """
+        Get the value stored for a key
+
+        Parameters
+        ----------
+        key : tuple of strings
+            The key eg ('doi', '10.1088/0004-637X/745/1/1')
+        expired : bool, optional
+            Return the value even if it is older than the ttl (default: False)
+
+        Returns
+        -------
+        string or None
+            The cached value, or None if there is no (unexpired) entry
+        """
+        key = _key(key)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                    'SELECT value, created, accessed FROM cache WHERE key = ?',
+                    (key,)).fetchone()
+            if row is None:
+                return None
+            if (not expired and self.ttl is not None and
+                    now - row[1] > self.ttl):
+                return None
+            if now - row[2] > self._access_resolution:
+                with self._connection:
+                    self._connection.execute(
+                            'UPDATE cache SET accessed = ? WHERE key = ?',
+                            (now, key))
+        return row[0]
+
+
+    def set(self, key, value):
+        """
+        Store a value for a key, evicting the least recently used entries if
+        the cache is full
+
+        Parameters
+        ----------
+        key : tuple of strings
+            The key eg ('doi', '10.1088/0004-637X/745/1/1')
+        value : string
+            The value to store
+        """
+        key = _key(key)
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                if self._connection.execute(
+                        'SELECT 1 FROM cache WHERE key = ?',
+                        (key,)).fetchone() is None:
+                    self._size += 1
+                self._connection.execute(
+                        'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                        (key, value, now, now))
+                if self._size > self.max_entries:
+                    self._connection.execute(
+                            'DELETE FROM cache WHERE key IN ('
+                            ' SELECT key FROM cache ORDER BY accessed'
+                            ' LIMIT ?)',
+                            (self._size - self.max_entries,))
+                    self._size = self.max_entries
+
+
+    def close(self):
+        """
+        Close the cache database
+        """
+        with self._lock:
+            self._connection.close()
+
+
+def _key(key):
+    """
+    Convert a tuple of strings into a single string key for the database
+    """
+    return '\x1f'.join(key)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Find the keys cited by a LaTeX document in its .bbl file (\\bibitem) or .aux
+file (\\citation), reading one line at a time
+
+A key may be split over lines, as BibTeX and TeX wrap long lines. The .aux
+files of \\include'd parts of a document (\\@input) are read as well.
+"""
+
+from __future__ import unicode_literals
+import io, os, re
+
+
+# Commands that cite keys, or include another .aux file
+_COMMAND_RE = re.compile(r'\\(bibitem|citation|@input)(?![A-Za-z])')
+# Text kept waiting for the end of a command is dropped beyond this length
+_MAX_PENDING = 65536
+
+
+def iter_citations(path):
+    """
+    Read the keys cited by a document from its .bbl or .aux file
+
+    Parameters
+    ----------
+    path : string
+        The path to the .bbl or .aux file
+
+    Yields
+    ------
+    string
+        Each key cited, in the order first cited, once
+    """
+    seen = set(['', '*'])  # \nocite{*} cites every entry, it is not a key
+    for key in _iter_keys(path, set()):
+        if key not in seen:
+            seen.add(key)
+            yield key
+
+
+def _iter_keys(path, opened):
+    """
+    Read the keys cited in a file, following \\@input to other .aux files
+
+    Parameters
+    ----------
+    path : string
+        The path to the .bbl or .aux file
+    opened : set of strings
+        The absolute paths of the files already read, which are not read again
+
+    Yields
+    ------
+    string
+        Each key cited, in order
+    """
+    opened.add(os.path.abspath(path))
+    pending = ''
+    with io.open(path, encoding='utf-8', errors='replace') as tex_file:
+        for line in tex_file:
+            # TeX breaks long lines without a space, so join them back up
+            text = pending + line.rstrip('\r\n')
+            pending = ''
+            position = 0
+            while True:
+                match = _COMMAND_RE.search(text, position)
+                if match is None:
+                    break
+                arguments = _read_arguments(text, match.end(), match.group(1))
+                if arguments is None:
+                    # The command continues on the next line
+                    pending = text[match.start():]
+                    if len(pending) > _MAX_PENDING:
+                        pending = ''
+                    break
+                values, position = arguments
+                if match.group(1) != '@input':
+                    for key in values:
+                        yield key
+                    continue
+                include = os.path.join(os.path.dirname(path), values[0])
+                if (os.path.abspath(include) not in opened and
+                        os.path.isfile(include)):
+                    for key in _iter_keys(include, opened):
+                        yield key
+
+
+def _read_arguments(text, position, command):
+    """
+    Read the arguments of a command
+
+    Parameters
+    ----------
+    text : string
+        The text the command is in
+    position : int
+        The position in text just after the command name
+    command : string
+        'bibitem', 'citation' or '@input'
+
+    Returns
+    -------
+    tuple: 2 elements, (list of strings, int) or None
+        The keys cited (or the file name of @input), and the position after
+        the arguments, or None if the text ends before the arguments do
+    """
+    position = _skip_space(text, position)
+    if command == 'bibitem' and text[position:position + 1] == '[':
+        # Optional label eg [{Smith} et~al.(2012)]
+        group = _read_group(text, position, '[', ']')
+        if group is None:
+            return None
+        position = _skip_space(text, group[1])
+    group = _read_group(text, position, '{', '}')
+    if group is None:
+        return None
+    value, position = group
+    if command == 'citation':
+        keys = [key.strip() for key in value.split(',')]
+        return [key for key in keys if key], position
+    return [value.strip()], position
+
+
+def _read_group(text, position, opening, closing):
+    """
+    Read a delimited group eg {...} starting at a position, where braces
+    inside the group are balanced
+
+    Returns
+    -------
+    tuple: 2 elements, (string, int) or None
+        The contents of the group and the position after it, or None if the
+        group does not end in text
+    """
+    if text[position:position + 1] != opening:
+        if position < len(text):
+            # Not a group, so a command without arguments
+            return '', position
+        return None
+    depth = 0
+    for index in range(position + 1, len(text)):
+        character = text[index]
+        if character == closing and depth == 0:
+            return text[position + 1:index], index + 1
+        if character == '{':
+            depth += 1
+        elif character == '}':
+            depth -= 1
+    return None
+
+
+def _skip_space(text, position):
+    """
+    Get the position of the first character that is not white space, at or
+    after a position
+    """
+    while text[position:position + 1].isspace():
+        position += 1
+    return position
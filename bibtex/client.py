@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+A client of bibtex.server.CitationServer, which only imports what it needs to
+talk to the server, so that it starts quickly
+"""
+
+from __future__ import unicode_literals
+import json, socket
+
+
+class CitationClient(object):
+
+    def __init__(self, socket_path):
+        """
+        A client of a CitationServer, which connects on its first request and
+        keeps the connection open for later requests
+
+        Parameters
+        ----------
+        socket_path : string
+            The path to the Unix socket of the server
+        """
+        self.socket_path = socket_path
+        self._socket = None
+        self._file = None
+
+
+    def request(self, op, **arguments):
+        """
+        Send a request, and wait for the response
+
+        Parameters
+        ----------
+        op : string
+            The operation eg 'get', with its arguments as keyword arguments
+            eg reference='2012ApJ...745....1S'
+
+        Returns
+        -------
+        dictionary
+            The response, with 'ok' and either the result or an 'error'
+        """
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self._socket.connect(self.socket_path)
+            except socket.error:
+                self.close()
+                raise
+            self._file = self._socket.makefile('rb')
+        arguments['op'] = op
+        self._socket.sendall(json.dumps(arguments).encode('utf-8') + b'\n')
+        line = self._file.readline()
+        if not line:
+            self.close()
+            raise socket.error('The server closed the connection')
+        return json.loads(line.decode('utf-8'))
+
+
+    def close(self):
+        """
+        Close the connection to the server
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def default_socket_path(bib_path):
+    """
+    Get the default path of the socket of a server for a bibtex file
+
+    Parameters
+    ----------
+    bib_path : string
+        The path to the bibtex file
+
+    Returns
+    -------
+    string
+        bib_path with '.sock' appended
+    """
+    return bib_path + '.sock'
@@ -0,0 +1,537 @@
+# -*- coding: utf-8 -*-
+"""
+Parse and format bibtex entries
+
+This is the offline core of BibtexFile, mnbib, bibmerge and bibsearch. It
+does not import the ADS client or the pdf tools, which bibtex.article only
+loads when an Article first queries ADS or reads a pdf.
+"""
+
+from __future__ import unicode_literals
+import re, sys, unicodedata
+from string import whitespace
+try:
+    from functools import lru_cache
+except ImportError:  # Python 2, convert without caching
+    def lru_cache(maxsize):
+        return lambda function: function
+if sys.version_info[0] < 3:
+    reload(sys)  # Hack to put setdefaultencoding back in after python startup
+    sys.setdefaultencoding('utf-8')  # Output utf-8 to teminal
+
+
+# Ranked ADS mirrors (the first is queried first until latencies are known),
+# whose URLs in entries are replaced by the main site
+ADS_MIRRORS = ['esoads.eso.org',
+               'adsabs.harvard.edu',
+               'cdsads.u-strasbg.fr',
+               'ukads.nottingham.ac.uk']
+
+
+class LazyArticle(object):
+
+    __slots__ = ('type', 'reference', '_entry', '_bibtex', '_authors')
+
+    def __init__(self, bibtex):
+        """
+        A compact Article for an entry of a bibtex file, which keeps the text
+        of the entry and only parses it when a field other than the type or
+        reference is first needed
+
+        The author list is parsed separately, when the authors are first
+        needed. The entry text is dropped once it has been parsed. Strings
+        that repeat between entries (the type, keys, journal, year, month and
+        the names of authors) are interned, so that entries share them.
+
+        It has the same attributes as an Article created from a bibtex entry,
+        except that doi is only present if the entry has one, and journal is
+        '' if the entry has no journal or series.
+
+        Parameters
+        ----------
+        bibtex : list of strings
+            A list containing a bibtex entry for an article
+        """
+        self.type = _intern(_TYPE_RE.search(bibtex[0]).group().lower())
+        self.reference = _REFERENCE_RE.search(bibtex[0]).group()
+        self._entry = ''.join(bibtex)
+        self._bibtex = None
+        self._authors = None  # The author value until the authors are parsed
+
+    def __repr__(self):
+        """
+        Return the ads bibcode (a unique identifier of the article)
+        """
+        return self.reference
+
+
+    @property
+    def bibtex(self):
+        """
+        Dictionary of the bibtex key : value pairs, as Article.bibtex
+        """
+        self._parse()
+        if 'author' not in self._bibtex:
+            self._bibtex['author'] = self.authors
+        return self._bibtex
+
+
+    @property
+    def authors(self):
+        """
+        Tuple of the (surname, initial, initial, ...) of each author
+        """
+        self._parse()
+        if not isinstance(self._authors, tuple):
+            self._authors = _parse_authors(self._authors, _intern)
+        return self._authors
+
+
+    @property
+    def author(self):
+        """
+        The surname of the first author
+        """
+        return self.authors[0][0]
+
+
+    @property
+    def doi(self):
+        """
+        The DOI of the article, an AttributeError if the entry has none
+        """
+        self._parse()
+        try:
+            return self._bibtex['doi']
+        except KeyError:
+            raise AttributeError('{0} has no doi'.format(self.reference))
+
+
+    @property
+    def journal(self):
+        """
+        The formatted journal name, or the series if there is no journal
+        """
+        self._parse()
+        return self._bibtex.get('journal', self._bibtex.get('series', ''))
+
+
+    @property
+    def title(self):
+        """
+        The title of the article, '' if the entry has none
+        """
+        self._parse()
+        return self._bibtex.get('title', '')
+
+
+    @property
+    def url(self):
+        """
+        The ADS URL of the article, '' if the entry has none
+        """
+        self._parse()
+        return self._bibtex.get('url', '')
+
+
+    @property
+    def year(self):
+        """
+        The year of the article
+        """
+        self._parse()
+        return self._bibtex['year']
+
+
+    def _parse(self):
+        """
+        Parse the fields of the entry, if they have not been, except the
+        author list
+        """
+        if self._bibtex is not None:
+            return
+        bib_dict = _parse_bibtex_fields(self._entry.splitlines(True))
+        self._authors = bib_dict.pop('author')
+        for key in ('reference', 'type'):
+            del(bib_dict[key])
+        bibtex = {}
+        for key, value in bib_dict.items():
+            if key in _INTERNED_KEYS:
+                value = _intern(value)
+            bibtex[_intern(key)] = value
+        if 'journal' in bibtex:
+            bibtex['journal'] = _intern(_format_journal(bibtex['journal']))
+        # Replace ADS mirror with main page for inclusion in bibtex file
+        if 'adsurl' in bibtex:
+            adsurl = bibtex['adsurl']
+            for mirror in ADS_MIRRORS:
+                adsurl = adsurl.replace(mirror, 'adsabs.harvard.edu')
+            bibtex['url'] = bibtex['adsurl'] = adsurl
+        self._bibtex = bibtex
+        self._entry = None
+
+
+# Keys whose values often repeat between entries, and so are interned by
+# LazyArticle
+_INTERNED_KEYS = frozenset(['adsnote', 'archiveprefix', 'booktitle',
+                            'journal', 'keywords', 'month', 'primaryclass',
+                            'publisher', 'series', 'year'])
+
+
+try:
+    _intern = sys.intern
+except AttributeError:  # Python 2, where intern only takes byte strings
+    _interned = {}
+
+    def _intern(string):
+        """
+        Get the one copy kept of a string equal to string
+        """
+        return _interned.setdefault(string, string)
+
+
+# Patterns used to parse bibtex entries
+_TYPE_RE = re.compile(r'(?<=@)'  # preceded by @
+                      r'.*'      # matches anything
+                      r'(?={)'   # followed by {
+                      )
+_REFERENCE_RE = re.compile(r'(?<={)'  # preceded by {
+                           r'.*'      # matches anything
+                           r'(?=,)'   # followed by ,
+                           )
+_SURNAME_WITH_INITIALS_RE = re.compile(r'(?<=\{).+(?=\},)')
+_INITIALS_RE = re.compile(r'(?<=\},).*')
+_SURNAME_RE = re.compile(r'(?<=\{).+(?=\})')
+_BRACE_RE = re.compile(r'[{}]')
+
+
+def _parse_bibtex_entry(bib_list):
+    """
+    Parse the text of a bibtex entry for an article and return a dictionary
+
+    Parameters
+    ----------
+    bib_list : list of strings
+        The bibtex entry to parse
+
+    Returns
+    -------
+    dictionary
+        A dictionary of bibtex key : value pairs
+    """
+    bib_dict = _parse_bibtex_fields(bib_list)
+    bib_dict['author'] = _parse_authors(bib_dict['author'])
+    return bib_dict
+
+
+def _parse_bibtex_fields(bib_list):
+    """
+    Parse the text of a bibtex entry into a dictionary, as _parse_bibtex_entry
+    but leaving the author list as it is in the entry
+
+    Parameters
+    ----------
+    bib_list : list of strings
+        The bibtex entry to parse
+
+    Returns
+    -------
+    dictionary
+        A dictionary of bibtex key : value pairs
+    """
+    bib_dict = {}
+    last_key = None
+    for line in bib_list:
+        line_list = line.split()
+        if len(line_list) > 1 and line_list[1] == '=':
+            # If the start of key = value pair
+            last_key = line_list[0]
+            bib_dict[last_key] = line_list[2:]
+        elif line[0] == '@':
+            # Determine bibtex entry definition line properties
+            bib_dict['type'] = [_TYPE_RE.search(line).group().lower()]
+            bib_dict['reference'] = [_REFERENCE_RE.search(line).group()]
+        else:
+            # Add line to value of last defined key
+            bib_dict[last_key].extend(line_list)
+
+    # All bibtex keys are now dictionary keys
+    # Need to remove { " , from beginning/end of bib_dict values
+    for key in bib_dict:
+        value = ' '.join(bib_dict[key])
+        if key == last_key:
+            # Remove last } of entry
+            head, _, tail = value.rpartition('}')
+            value = ' '.join((head + tail).split())
+        bib_dict[key] = _strip_value_delimiters(value)
+    return bib_dict
+
+
+def _parse_authors(author_list, intern=None):
+    """
+    Parse the author list of a bibtex entry into a tuple of names
+
+    This is hardcoded for ADS braces format
+
+    Parameters
+    ----------
+    author_list : string
+        The author value of the entry
+    intern : function, optional
+        Applied to each surname and initial, eg to share repeated strings
+        (default: None = keep them as they are)
+
+    Returns
+    -------
+    tuple of tuples of strings
+        The (surname, initial, initial, ...) of each author
+    """
+    authors = []
+    # Authors separated by ' and '
+    # Example author: {Ivezi{\'c}}, {\v Z}.~R.
+    for author in author_list.split(' and '):
+        if author == '\n':
+            continue
+        try:
+            name = [_SURNAME_WITH_INITIALS_RE.search(author).group(0)]
+            initials = _INITIALS_RE.search(author).group(0).split('.')
+            for initial in initials:
+                stripped = initial.strip('~' + whitespace)
+                if stripped != '':
+                    name.append(stripped)
+        except AttributeError:
+            try:
+                name = [_SURNAME_RE.search(author).group(0)]
+            except AttributeError:  # likely et al.
+                name = [author]
+        if intern is not None:
+            name = [intern(part) for part in name]
+        authors.append(tuple(name))
+    return tuple(authors)
+
+
+def _strip_value_delimiters(value):
+    """
+    Remove a trailing comma and enclosing quotes and braces from a value
+
+    Enclosing pairs are removed from the outside in for as long as the value
+    starts and ends with a quote, or starts with a brace that is not closed
+    before the final character. The brace pairs are matched once, so this is
+    linear in the length of the value.
+
+    Parameters
+    ----------
+    value : string
+        A bibtex value eg '{{The Title}},'
+
+    Returns
+    -------
+    string
+        The value without delimiters eg 'The Title'
+    """
+    if value[-1:] == ',':
+        value = value[:-1]
+    start, end = 0, len(value)
+    closing = None  # Positions of the opening : closing braces
+    while start < end:
+        if end - start == 1 or (value[start] == '"' and value[end - 1] == '"'):
+            pass
+        elif value[start] == '{':
+            if closing is None:
+                closing = _match_braces(value)
+            if closing.get(start, end) < end - 1:
+                break
+        else:
+            break
+        start += 1
+        end -= 1
+    return value[start:end]
+
+
+def _match_braces(value):
+    """
+    Find the position of the closing brace for each opening brace in a string
+
+    Parameters
+    ----------
+    value : string
+        A string containing braces
+
+    Returns
+    -------
+    dictionary
+        Opening brace position : closing brace position, for matched braces
+    """
+    closing = {}
+    opening = []
+    for brace in _BRACE_RE.finditer(value):
+        if brace.group() == '{':
+            opening.append(brace.start())
+        elif opening:
+            closing[opening.pop()] = brace.start()
+    return closing
+
+
+def _format_journal(journal):
+    """
+    Convert ADS journal codes into names suitable for use in references
+
+    Parameters
+    ----------
+    journal: string
+        An ADS BibTeX journal code eg '\apj'
+
+    Returns
+    -------
+    string
+        The formatted version of a journal name eg 'ApJ'
+    """
+    journals = {
+        r'\aap': r'A\&A',
+        r'\aaps': r'A\&AS',
+        r'\aj': 'AJ',
+        r'\apj': 'ApJ',
+        r'\apjl': 'ApJL',
+        r'\apjs': 'ApJS',
+        r'\araa': r'ARA\&A',
+        'ArXiv e-prints': 'arXiv',
+        r'\mnras': 'MNRAS',
+        r'\nat': 'Nature',
+        r'\pasj': 'PASJ',
+        r'\pasp': 'PASP',
+        r'\physrep': 'Phys. Rep.',
+        r'\prd': 'PhRvD',
+    }
+    if journal in journals:
+        return journals[journal]
+    return journal
+
+
+def _normalise_doi(doi):
+    """
+    Normalise a DOI so that it can be used as a lookup key
+
+    Parameters
+    ----------
+    doi : string
+        A DOI, possibly with a 'doi:' or resolver URL prefix
+
+    Returns
+    -------
+    string
+        The lower case DOI eg '10.1088/0004-637x/745/1/1'
+    """
+    doi = doi.strip().lower()
+    for prefix in ('https://doi.org/', 'http://dx.doi.org/', 'doi:'):
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):]
+    return doi
+
+
+def _normalise_arxiv(eprint):
+    """
+    Normalise an arXiv identifier so that it can be used as a lookup key
+
+    Parameters
+    ----------
+    eprint : string
+        An arXiv identifier eg 'arXiv:1201.4773v2' or 'astro-ph/0601001'
+
+    Returns
+    -------
+    string
+        The lower case identifier without prefix or version eg '1201.4773'
+    """
+    eprint = eprint.strip().lower()
+    if eprint.startswith('arxiv:'):
+        eprint = eprint[6:]
+    return re.sub(r'v[0-9]+$', '', eprint)
+
+
+# LaTeX commands converted by _latex_to_text : text
+_LATEX_COMMANDS = {
+    # Letters
+    'AA': 'Å', 'aa': 'å', 'AE': 'Æ', 'ae': 'æ', 'L': 'Ł', 'l': 'ł',
+    'O': 'Ø', 'o': 'ø', 'OE': 'Œ', 'oe': 'œ', 'ss': 'ß', 'i': 'ı', 'j': 'ȷ',
+    # Greek letters
+    'alpha': 'α', 'beta': 'β', 'gamma': 'γ', 'delta': 'δ', 'epsilon': 'ε',
+    'varepsilon': 'ε', 'zeta': 'ζ', 'eta': 'η', 'theta': 'θ',
+    'vartheta': 'ϑ', 'iota': 'ι', 'kappa': 'κ', 'lambda': 'λ', 'mu': 'μ',
+    'nu': 'ν', 'xi': 'ξ', 'pi': 'π', 'rho': 'ρ', 'sigma': 'σ', 'tau': 'τ',
+    'upsilon': 'υ', 'phi': 'φ', 'varphi': 'φ', 'chi': 'χ', 'psi': 'ψ',
+    'omega': 'ω', 'Gamma': 'Γ', 'Delta': 'Δ', 'Theta': 'Θ', 'Lambda': 'Λ',
+    'Xi': 'Ξ', 'Pi': 'Π', 'Sigma': 'Σ', 'Upsilon': 'Υ', 'Phi': 'Φ',
+    'Psi': 'Ψ', 'Omega': 'Ω',
+    # Maths
+    'times': '✕', 'pm': '±', 'mp': '∓', 'cdot': '·', 'div': '÷',
+    'gt': '>', 'lt': '<', 'ge': '≥', 'geq': '≥', 'le': '≤', 'leq': '≤',
+    'gtrsim': '≳', 'lesssim': '≲', 'gg': '≫', 'll': '≪', 'ne': '≠',
+    'neq': '≠', 'sim': '∼', 'approx': '≈', 'simeq': '≃', 'propto': '∝',
+    'infty': '∞', 'partial': '∂', 'nabla': '∇', 'sqrt': '√',
+    'rightarrow': '→', 'to': '→', 'leftarrow': '←', 'star': '⋆',
+    'prime': '′', 'circ': '°', 'degr': '°', 'arcmin': '′', 'arcsec': '″',
+    'odot': '☉', 'sun': '☉', 'oplus': '⊕', 'earth': '⊕', 'tilde': '~',
+    # Text
+    'ndash': '--', 'mdash': '---', 'textendash': '--', 'textemdash': '---',
+    'S': '§', 'dag': '†', 'ddag': '‡', 'copyright': '©', 'pounds': '£',
+}
+# LaTeX accents : combining character, for accents that are a symbol
+# (written eg \'e) and a letter (written eg \v{s} or \v s)
+_LATEX_ACCENTS = {
+    "'": '\u0301', '`': '\u0300', '^': '\u0302', '"': '\u0308',
+    '~': '\u0303', '=': '\u0304', '.': '\u0307', 'u': '\u0306',
+    'v': '\u030c', 'H': '\u030b', 'c': '\u0327', 'k': '\u0328',
+    'r': '\u030a',
+}
+# Tokens converted by _latex_to_text, in a single pass. An accent takes the
+# letter after it, and a command all of the letters of its name
+_LATEX_RE = re.compile(
+    r'\\([`\'^"~=.])(?:\{(\\?[A-Za-z])\}|(\\?[A-Za-z]))'     # eg \'e \'{\i}
+    r'|\\([uvHckr])(?:\{(\\?[A-Za-z])\}|\s+(\\?[A-Za-z]))'   # eg \v{s} \v s
+    r'|\\([A-Za-z]+)'                                        # eg \alpha
+    r'|\\["\']|[\\{}$/^_\'`]'                                # removed
+)
+
+
+@lru_cache(maxsize=4096)
+def _latex_to_text(latex):
+    """
+    Convert a string with latex characters to a standard character set
+
+    The string is converted in a single pass, and conversions are cached, so
+    this can be used on every entry of a large library.
+
+    Parameters
+    ----------
+    latex : string
+        A string containing possible LaTeX encodings eg 'H$_{2}$O'
+
+    Returns
+    -------
+    string
+        A string converted to a standard format eg H20
+    """
+    return _LATEX_RE.sub(_convert_latex_token, latex)
+
+
+def _convert_latex_token(match):
+    """
+    Convert a token matched by _LATEX_RE to text
+
+    Accented letters are composed into one character if possible, unknown
+    commands lose their backslash, and other tokens are removed.
+    """
+    accent, braced, letter, letter_accent, letter_braced, letter_spaced, \
+        command = match.groups()
+    if command is not None:
+        return _LATEX_COMMANDS.get(command, command)
+    if accent is None:
+        accent = letter_accent
+        letter = letter_braced or letter_spaced
+    elif braced is not None:
+        letter = braced
+    if accent is None:
+        return ''
+    # Dotless i and j take the accent in place of the dot
+    letter = letter.lstrip('\\')
+    return unicodedata.normalize('NFC', letter + _LATEX_ACCENTS[accent])
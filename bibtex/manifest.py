@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io, json, os
+
+from bibtex.bibtexfile import _write_atomically
+from bibtex.snapshot import file_hash
+
+
+class Manifest(object):
+
+    def __init__(self, path):
+        """
+        A record of the pdfs processed into a .bib file, so that a later run
+        only processes pdfs that are new or have changed
+
+        For each pdf the size, modification time and content hash are kept,
+        with the outcome ('added' or 'failed'), its identifier and the
+        reference of its bibtex entry. A pdf is unchanged if its size and
+        modification time are the same, so unchanged pdfs are not read.
+
+        Parameters
+        ----------
+        path : string
+            The path to the manifest (JSON), created when it is saved
+        """
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        # pdf path relative to the manifest : record dictionary
+        self.records = {}
+        if os.path.exists(path):
+            with io.open(path, encoding='utf-8') as manifest_file:
+                self.records = json.load(manifest_file)
+        # Hashes of files looked up this run, pdf path : SHA-1
+        self._hashes = {}
+        # SHA-1 : recorded pdf path, built when a pdf has changed
+        self._names = None
+
+
+    def __len__(self):
+        """
+        Returns the number of pdfs in the manifest
+        """
+        return len(self.records)
+
+
+    def lookup(self, pdf_path):
+        """
+        Get the record of a pdf, if it has not changed since it was recorded
+
+        A pdf whose size or modification time has changed is hashed, and is
+        unchanged if its content is the same as when it was recorded, or as a
+        recorded pdf that no longer exists (it has been renamed).
+
+        Parameters
+        ----------
+        pdf_path : string
+            The path to the pdf
+
+        Returns
+        -------
+        dictionary or None
+            The record, or None if the pdf is new or has changed
+        """
+        name = self._name(pdf_path)
+        stat = os.stat(pdf_path)
+        record = self.records.get(name)
+        if (record is not None and record['size'] == stat.st_size and
+                record['mtime'] == stat.st_mtime):
+            return record
+        # Compare the content
+        content_hash = self._hash(pdf_path)
+        if record is None or record['sha1'] != content_hash:
+            record = self._renamed(content_hash)
+            if record is None:
+                return None
+        record.update(size=stat.st_size, mtime=stat.st_mtime)
+        self.records[name] = record
+        return record
+
+
+    def record(self, pdf_path, outcome, article=None, reference=None,
+               original_path=None):
+        """
+        Record the outcome of processing a pdf
+
+        Parameters
+        ----------
+        pdf_path : string
+            The path to the pdf (after it has been renamed)
+        outcome : string
+            'added' or 'failed'
+        article : Article, optional
+            The Article created from the pdf, if it was identified
+        reference : string, optional
+            The reference of the bibtex entry of the pdf (default: None = the
+            reference of article, if it has one)
+        original_path : string, optional
+            The path to the pdf before it was renamed, if it was
+        """
+        if original_path is not None and original_path != pdf_path:
+            self.records.pop(self._name(original_path), None)
+            if original_path in self._hashes:
+                self._hashes[pdf_path] = self._hashes.pop(original_path)
+        stat = os.stat(pdf_path)
+        record = {'size': stat.st_size,
+                  'mtime': stat.st_mtime,
+                  'sha1': self._hash(pdf_path),
+                  'outcome': outcome,
+                  'identifier': None,
+                  'identifier_type': None,
+                  'reference': reference}
+        if article is not None:
+            record['identifier'] = article.identifier
+            record['identifier_type'] = article.identifier_type
+            if reference is None:
+                record['reference'] = getattr(article, 'reference', None)
+        self.records[self._name(pdf_path)] = record
+
+
+    def prune(self):
+        """
+        Remove the records of pdfs that no longer exist
+        """
+        for name in list(self.records):
+            if not os.path.exists(os.path.join(self.directory, name)):
+                del self.records[name]
+
+
+    def save(self):
+        """
+        Write the manifest, replacing the previous one atomically
+        """
+        _write_atomically(self.path, [json.dumps(self.records, indent=1,
+                                                 sort_keys=True)])
+
+
+    def _name(self, pdf_path):
+        """
+        Get the path to a pdf relative to the manifest
+        """
+        return os.path.relpath(os.path.abspath(pdf_path), self.directory)
+
+
+    def _renamed(self, content_hash):
+        """
+        Remove and return the record of a pdf with some content that no longer
+        exists, or return None if there is not one
+        """
+        if self._names is None:
+            self._names = dict((record['sha1'], name)
+                               for name, record in self.records.items())
+        name = self._names.get(content_hash)
+        if (name is None or name not in self.records or
+                self.records[name]['sha1'] != content_hash or
+                os.path.exists(os.path.join(self.directory, name))):
+            return None
+        return self.records.pop(name)
+
+
+    def _hash(self, pdf_path):
+        """
+        Get the SHA-1 hash of the content of a pdf, hashing it at most once
+        """
+        if pdf_path not in self._hashes:
+            self._hashes[pdf_path] = file_hash(pdf_path)
+        return self._hashes[pdf_path]
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Merge several bibtex files into one file, sorted as BibtexFile.write_to_file
+sorts entries, without duplicates, keeping a bounded number of entries in
+memory
+
+Entries are duplicates if they have the same reference (ADS bibcode), DOI or
+arXiv identifier. The input files are read one entry at a time, and the
+entries are sorted in runs of a fixed size that are kept in temporary files,
+then merged into the output file. Only the keys of the entries seen, to find
+duplicates, are kept in memory for the whole merge.
+"""
+
+from __future__ import unicode_literals
+import heapq, marshal, tempfile
+
+from bibtex.article import Article
+from bibtex.bibtexfile import (_NON_ARTICLE_ENTRIES, _format_entry,
+                               _iter_entries, _sort_key, _write_atomically)
+from bibtex.entry import _normalise_arxiv, _normalise_doi
+
+
+# Ways to choose the entry kept from duplicates:
+# 'first' - the entry read first (from the first input file)
+# 'last' - the entry read last
+# 'fields' - the entry with the most fields, or the first if they have as many
+POLICIES = ('first', 'last', 'fields')
+# The number of entries sorted in memory at once
+_RUN_SIZE = 10000
+
+
+def merge_files(paths, output_path, policy='first', run_size=_RUN_SIZE):
+    """
+    Merge bibtex files into one sorted file without duplicate entries
+
+    Parameters
+    ----------
+    paths : list of strings
+        The paths to the bibtex files to merge
+    output_path : string
+        The path to the bibtex file to write, which is replaced atomically
+        once the input files are read (so it can be one of them)
+    policy : string, optional
+        How to choose the entry to keep from duplicates, one of POLICIES
+        (default: 'first')
+    run_size : int, optional
+        The number of entries sorted in memory at once (default: 10000)
+
+    Returns
+    -------
+    tuple: 2 elements, (int, list of tuples: 3 elements, (string, string,
+                                                          string))
+        The number of entries written, and the reference of each duplicate
+        entry dropped, the path to the file it is in, and the reference of
+        the entry kept in its place
+    """
+    if policy not in POLICIES:
+        raise ValueError('Unknown policy {0}, not one of {1}'.format(
+                                                policy, ', '.join(POLICIES)))
+    runs = []
+    try:
+        kept, count = _write_runs(paths, policy, run_size, runs)
+        duplicates = []
+        _write_atomically(output_path,
+                          _iter_kept(runs, kept, paths, duplicates))
+    finally:
+        for run in runs:
+            run.close()
+    return count - len(duplicates), duplicates
+
+
+def _write_runs(paths, policy, run_size, runs):
+    """
+    Read the entries of bibtex files, grouping duplicates, and write them to
+    sorted runs
+
+    Parameters
+    ----------
+    paths : list of strings
+        The paths to the bibtex files
+    policy : string
+        How to choose the entry to keep from duplicates, one of POLICIES
+    run_size : int
+        The number of entries in each run
+    runs : list
+        A list to append the temporary file of each run to
+
+    Returns
+    -------
+    tuple: 2 elements, (dictionary, int)
+        Group of duplicates : (id, score, reference) of the entry kept from
+        it, and the number of entries read
+    """
+    groups = {}  # Key of an entry eg ('doi', '10.1093/...') : its group
+    parents = {}  # Group : the group it has been joined to, or itself
+    kept = {}  # Group that has not been joined to another : the entry kept
+    run = []
+    entry_id = 0
+    for input_index, path in enumerate(paths):
+        with open(path, 'r') as bib_file:
+            for entry_type, bibtex in _iter_entries(bib_file):
+                if entry_type in _NON_ARTICLE_ENTRIES:
+                    continue
+                article = Article(bibtex=bibtex)
+                keys = _duplicate_keys(article)
+                # An entry joins every group it shares a key with, eg C
+                # joins the group of A by reference and of B by DOI
+                joined = set(_find_group(parents, groups[key])
+                             for key in keys if key in groups)
+                group = min(joined) if joined else entry_id
+                parents[group] = group
+                for other in joined - set([group]):
+                    parents[other] = group
+                    other_kept = kept.pop(other)
+                    if other_kept[1] > kept[group][1]:
+                        kept[group] = other_kept
+                for key in keys:
+                    groups.setdefault(key, group)
+                score = _score(article, entry_id, policy)
+                if group not in kept or score > kept[group][1]:
+                    kept[group] = (entry_id, score, article.reference)
+                author, year = _sort_key(article)
+                run.append((author, year, entry_id, group, input_index,
+                            article.reference, _format_entry(article)))
+                entry_id += 1
+                if len(run) == run_size:
+                    runs.append(_write_run(run))
+                    run = []
+    if run:
+        runs.append(_write_run(run))
+    # Groups written to runs may have been joined to others since
+    return ({group: kept[_find_group(parents, group)] for group in parents},
+            entry_id)
+
+
+def _find_group(parents, group):
+    """
+    Find the group that a group of duplicates has been joined to
+    """
+    while parents[group] != group:
+        parents[group] = parents[parents[group]]
+        group = parents[group]
+    return group
+
+
+def _iter_kept(runs, kept, paths, duplicates):
+    """
+    Merge sorted runs, yielding the entries kept from each group of
+    duplicates
+
+    Parameters
+    ----------
+    runs : list of files
+        The temporary files of the runs
+    kept : dictionary
+        Group of duplicates : (id, score, reference) of the entry kept
+    paths : list of strings
+        The paths to the bibtex files merged
+    duplicates : list
+        A list to append the (reference, path, reference kept) of each
+        duplicate entry dropped to
+
+    Yields
+    ------
+    string
+        The text of each entry kept, in sorted order
+    """
+    for (author, year, entry_id, group, input_index, reference,
+            entry) in heapq.merge(*[_read_run(run) for run in runs]):
+        kept_id, score, kept_reference = kept[group]
+        if entry_id == kept_id:
+            yield entry
+        else:
+            duplicates.append((reference, paths[input_index],
+                               kept_reference))
+
+
+def _duplicate_keys(article):
+    """
+    Get the keys that make entries duplicates, its reference, DOI and arXiv
+    identifier
+    """
+    keys = [('reference', article.reference)]
+    if article.bibtex.get('doi'):
+        keys.append(('doi', _normalise_doi(article.bibtex['doi'])))
+    if article.bibtex.get('eprint'):
+        keys.append(('arxiv', _normalise_arxiv(article.bibtex['eprint'])))
+    return keys
+
+
+def _score(article, entry_id, policy):
+    """
+    Score an entry, so that the entry kept from duplicates has the highest
+    """
+    if policy == 'first':
+        return -entry_id
+    elif policy == 'last':
+        return entry_id
+    else:  # fields
+        return (len(article.bibtex), -entry_id)
+
+
+def _write_run(run):
+    """
+    Sort entries and write them to a temporary file
+
+    Returns
+    -------
+    file
+        The temporary file, at its start
+    """
+    run.sort()
+    run_file = tempfile.TemporaryFile()
+    for record in run:
+        marshal.dump(record, run_file)
+    run_file.seek(0)
+    return run_file
+
+
+def _read_run(run_file):
+    """
+    Read the entries of a run, in order
+    """
+    while True:
+        try:
+            yield marshal.load(run_file)
+        except EOFError:
+            return
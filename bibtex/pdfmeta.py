@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Find identifiers in the metadata of a pdf (the Info dictionary and the XMP
+metadata stream) without converting it to text
+
+Only the end of the file, the cross-reference section and the metadata
+objects are read, each with a bounded read.
+"""
+
+from __future__ import unicode_literals
+import re, zlib
+
+
+# Bounded read sizes, in bytes
+_TAIL_SIZE = 2048
+_OBJECT_SIZE = 65536
+_XREF_SIZE = 65536
+# The maximum number of incremental updates to follow
+_MAX_XREF_SECTIONS = 8
+
+_STARTXREF_RE = re.compile(br'startxref\s+(\d+)')
+_XREF_SUBSECTION_RE = re.compile(br'(\d+)\s+(\d+)\s*[\r\n]+')
+_REFERENCE_RE = {key: re.compile(br'/' + key + br'\s+(\d+)\s+\d+\s+R')
+                 for key in (b'Info', b'Root', b'Metadata', b'Prev')}
+_INTEGER_RE = {key: re.compile(br'/' + key + br'\s+(\d+)')
+               for key in (b'Prev', b'Size')}
+_ARRAY_RE = {key: re.compile(br'/' + key + br'\s*\[([\d\s]*)\]')
+             for key in (b'W', b'Index')}
+_STRING_RE = re.compile(br'\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)'
+                        br'|<[0-9A-Fa-f\s]+>')
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+_XMP_ID_RE = re.compile(r'(?:uuid|xmp\.[a-z]id):[^\s"<]*', re.IGNORECASE)
+
+# Identifiers, in the priority order of Article._identifier_from_article
+_BIBCODE_RE = re.compile(r'(?<![0-9A-Za-z])'
+                         r'[0-9]{4}'        # year
+                         r'[A-Za-z&][A-Za-z&.]{4}'  # journal
+                         r'[0-9.]{4}'       # volume
+                         r'[A-Za-z.]'       # qualifier eg 'L'
+                         r'[0-9.]{3}[0-9]'  # start page
+                         r'[A-Z]'           # author initial
+                         r'(?![0-9A-Za-z])')
+_ARXIV_RE = re.compile(r'arxiv:\s*'
+                       r'([0-9]{4}\.[0-9]{4,5}'           # new style
+                       r'|[a-z\-]+(?:\.[a-z]{2})?/[0-9]{7})',  # old style
+                       re.IGNORECASE)
+# DOIs as bibtex.scanner finds them in the text of a pdf (a 4 digit registrant)
+_DOI_RE = re.compile(r'10\.[0-9]{4}/[^\s"<>()]+')
+
+
+def metadata_identifier_lines(path):
+    """
+    Find identifiers in the metadata of a pdf
+
+    Parameters
+    ----------
+    path : string
+        A path to a pdf
+
+    Returns
+    -------
+    list of strings
+        A line for each identifier found, in the form the text of a pdf is
+        searched by Article._identifier_from_article (bibcodes, then arXiv
+        identifiers, then DOIs), or an empty list if none were found
+    """
+    try:
+        text = _metadata_text(path)
+    except (IOError, OSError, ValueError, zlib.error):
+        return []
+    except (AttributeError, IndexError, KeyError):  # A malformed pdf
+        return []
+    lines = []
+    lines += [bibcode + '\n' for bibcode in _BIBCODE_RE.findall(text)]
+    lines += ['arXiv:' + eprint + '\n' for eprint in _ARXIV_RE.findall(text)]
+    lines += [doi.rstrip('.,;') + '\n' for doi in _DOI_RE.findall(text)]
+    return lines
+
+
+def _metadata_text(path):
+    """
+    Get the text of the Info dictionary and XMP metadata of a pdf
+
+    Parameters
+    ----------
+    path : string
+        A path to a pdf
+
+    Returns
+    -------
+    string
+        The strings of the Info dictionary and the XMP packet, with document
+        and instance ids removed
+    """
+    with open(path, 'rb') as pdf:
+        pdf.seek(0, 2)
+        length = pdf.tell()
+        pdf.seek(max(0, length - _TAIL_SIZE))
+        startxref = _STARTXREF_RE.findall(pdf.read())
+        if not startxref:
+            return ''
+        xref = _CrossReference(pdf, int(startxref[-1]))
+        if b'/Encrypt' in xref.trailer:
+            return ''
+        texts = []
+        info = _read_reference(pdf, xref, xref.trailer, b'Info')
+        if info:
+            texts += [_decode_string(string)
+                      for string in _STRING_RE.findall(info.split(b'>>')[0])]
+        root = _read_reference(pdf, xref, xref.trailer, b'Root')
+        metadata = _read_reference(pdf, xref, root, b'Metadata')
+        if metadata:
+            xmp = _read_stream(metadata).decode('utf-8', 'replace')
+            texts.append(_XMP_ID_RE.sub('', xmp))
+    return '\n'.join(texts)
+
+
+class _CrossReference(object):
+
+    def __init__(self, pdf, offset):
+        """
+        The cross-reference sections of a pdf, following incremental updates
+
+        Entries of cross-reference tables are read from the file as they are
+        looked up, so a large table is never read in full.
+
+        Parameters
+        ----------
+        pdf : file
+            The pdf, opened in binary mode
+        offset : int
+            The offset of the last cross-reference section
+        """
+        self.pdf = pdf
+        self.trailer = None  # The trailer dictionary of the last section
+        # Newest first, each a dictionary of object number : offset (for a
+        # stream) or a list of (first number, count, offset) (for a table)
+        self.sections = []
+        for section in range(_MAX_XREF_SECTIONS):
+            pdf.seek(offset)
+            data = pdf.read(_XREF_SIZE)
+            if data.startswith(b'xref'):
+                trailer, entries = _read_xref_table(pdf, offset, data)
+            else:
+                trailer = data.split(b'stream')[0]
+                entries = _read_xref_stream(data)
+            if self.trailer is None:
+                self.trailer = trailer
+            self.sections.append(entries)
+            previous = _INTEGER_RE[b'Prev'].search(trailer)
+            if previous is None:
+                break
+            offset = int(previous.group(1))
+
+
+    def offset(self, number):
+        """
+        Get the byte offset of an uncompressed object
+
+        Parameters
+        ----------
+        number : int
+            The object number
+
+        Returns
+        -------
+        int or None
+            The offset, or None if the object is not found
+        """
+        for entries in self.sections:
+            if isinstance(entries, dict):
+                if number in entries:
+                    return entries[number]
+                continue
+            for first, count, start in entries:
+                if first <= number < first + count:
+                    self.pdf.seek(start + 20 * (number - first))
+                    entry = self.pdf.read(18)
+                    if entry.endswith(b'n'):
+                        return int(entry[:10])
+                    return None
+        return None
+
+
+def _read_xref_table(pdf, offset, data):
+    """
+    Find the subsections and trailer of a cross-reference table, seeking past
+    the 20 byte entries of each subsection rather than reading them
+
+    Returns
+    -------
+    tuple: 2 elements, (trailer, subsections)
+        The trailer dictionary (bytes), and a list of
+        (first object number, number of objects, offset of the entries)
+    """
+    subsections = []
+    position = len(b'xref')
+    while True:
+        while data[position:position + 1].isspace():
+            position += 1
+        subsection = _XREF_SUBSECTION_RE.match(data, position)
+        if subsection is None:
+            break
+        first, count = int(subsection.group(1)), int(subsection.group(2))
+        subsections.append((first, count, offset + subsection.end()))
+        # Continue reading after the entries
+        offset += subsection.end() + 20 * count
+        pdf.seek(offset)
+        data = pdf.read(_XREF_SIZE)
+        position = 0
+    trailer = data[position:].split(b'startxref')[0]
+    return trailer, subsections
+
+
+def _read_xref_stream(data):
+    """
+    Read a cross-reference stream (PDF 1.5)
+
+    Returns
+    -------
+    dictionary
+        Object number : byte offset for the objects stored uncompressed
+    """
+    dictionary = data.split(b'stream')[0]
+    widths = _ARRAY_RE[b'W'].search(dictionary)
+    if widths is None:
+        raise ValueError('Cross-reference stream has no /W')
+    widths = [int(width) for width in widths.group(1).split()]
+    if len(widths) != 3:
+        raise ValueError('Cross-reference stream /W is not 3 widths')
+    index = _ARRAY_RE[b'Index'].search(dictionary)
+    if index:
+        index = [int(number) for number in index.group(1).split()]
+    else:
+        size = _INTEGER_RE[b'Size'].search(dictionary)
+        if size is None:
+            raise ValueError('Cross-reference stream has no /Size')
+        index = [0, int(size.group(1))]
+    rows = bytearray(_read_stream(data))
+    row_width = sum(widths)
+    offsets = {}
+    row = 0
+    for first, count in zip(index[0::2], index[1::2]):
+        for number in range(first, first + count):
+            fields = []
+            position = row * row_width
+            for width in widths:
+                value = 0
+                for byte in rows[position:position + width]:
+                    value = value * 256 + byte
+                fields.append(value)
+                position += width
+            # A missing type field defaults to 1 (uncompressed object)
+            if (fields[0] if widths[0] else 1) == 1:
+                offsets[number] = fields[1]
+            row += 1
+    return offsets
+
+
+def _read_reference(pdf, xref, dictionary, key):
+    """
+    Read the start (at most _OBJECT_SIZE bytes) of the object referred to by
+    a key of a dictionary, or return an empty string if it cannot be found
+    """
+    reference = _REFERENCE_RE[key].search(dictionary)
+    if reference is None:
+        return b''
+    offset = xref.offset(int(reference.group(1)))
+    if offset is None:
+        return b''
+    pdf.seek(offset)
+    return pdf.read(_OBJECT_SIZE).split(b'endobj')[0]
+
+
+def _read_stream(data):
+    """
+    Get the decoded contents of a stream object, which can be uncompressed or
+    compressed with FlateDecode
+    """
+    dictionary, _, stream = data.partition(b'stream')
+    stream = stream.lstrip(b'\r\n').split(b'endstream')[0]
+    if b'/FlateDecode' in dictionary:
+        return zlib.decompressobj().decompress(stream)
+    return stream
+
+
+def _decode_string(string):
+    """
+    Decode a literal (...) or hexadecimal <...> pdf string into text
+    """
+    if string.startswith(b'<'):
+        value = bytearray.fromhex(re.sub(br'\s', b'', string[1:-1]).decode())
+        value = bytes(value)
+    else:
+        value = re.sub(br'\\([nrtbf()\\])',
+                       lambda match: _ESCAPES.get(match.group(1),
+                                                  match.group(1)),
+                       string[1:-1])
+    if value.startswith(b'\xfe\xff'):
+        return value[2:].decode('utf-16-be', 'replace')
+    return value.decode('latin-1')
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io, time
+
+from bibtex.ads import URLError
+from bibtex.article import Article, _ads_client, _ads_query_url
+from bibtex.bibtexfile import _iter_entries
+from bibtex.entry import _normalise_arxiv, _parse_bibtex_entry
+
+
+def resolve_articles(articles, batch_size=50):
+    """
+    Parse the bibtex entries of Articles created from pdfs with resolve=False,
+    and rename the pdfs
+
+    The entries of Articles with a bibcode (from an ABS or arXiv identifier)
+    are requested from ADS in batches, and any that are not found in a batch
+    response are requested one at a time, as are those with a DOI.
+
+    Parameters
+    ----------
+    articles : list of Articles
+        Articles created with Article(path=..., resolve=False)
+    batch_size : int, optional
+        The maximum number of bibcodes in one ADS request (default: 50)
+
+    Returns
+    -------
+    list of exceptions or None
+        The error raised resolving each Article, or None if it was resolved
+    """
+    entries = request_entries(articles, batch_size)
+    return [resolve_article(article, entry)
+            for article, entry in zip(articles, entries)]
+
+
+def request_entries(articles, batch_size=50):
+    """
+    Request the bibtex entries of the Articles with a bibcode (from an ABS or
+    arXiv identifier) from ADS in batches
+
+    Articles with a cached entry or a DOI are left to resolve_article, as are
+    those not found in a batch response, so that these can be requested
+    concurrently.
+
+    Parameters
+    ----------
+    articles : list of Articles
+        Articles created with Article(path=..., resolve=False)
+    batch_size : int, optional
+        The maximum number of bibcodes in one ADS request (default: 50)
+
+    Returns
+    -------
+    list of lists of strings or None
+        The bibtex entry of each Article, or None if it was not requested or
+        not found
+    """
+    entries = {}  # index of an Article in articles : bibtex entry
+    if not Article.offline and batch_size > 1:
+        bibcodes = []  # (index, bibcode) of Articles to request in batches
+        for index, article in enumerate(articles):
+            if (Article.cache is not None and
+                    (article.identifier_type, article.identifier)
+                    in Article.cache):
+                continue
+            bibcode = article._ads_bibcode()
+            if bibcode is not None:
+                bibcodes.append((index, bibcode))
+        for start in range(0, len(bibcodes), batch_size):
+            entries.update(_request_batch(articles,
+                                          bibcodes[start:start + batch_size]))
+    return [entries.get(index) for index in range(len(articles))]
+
+
+def resolve_article(article, entry=None):
+    """
+    Parse the bibtex entry of an Article created from a pdf with
+    resolve=False, and rename the pdf
+
+    Parameters
+    ----------
+    article : Article
+        An Article created with Article(path=..., resolve=False)
+    entry : list of strings, optional
+        The bibtex entry of the Article from request_entries (default: None =
+        get it from the cache or ADS)
+
+    Returns
+    -------
+    exception or None
+        The error raised resolving the Article, or None if it was resolved
+    """
+    try:
+        if entry is not None:
+            article.resolve(entry)
+            # Only cached once it has parsed, as in Article.resolve
+            if Article.cache is not None:
+                Article.cache.set((article.identifier_type,
+                                   article.identifier), ''.join(entry))
+        else:
+            article.resolve()
+    except (LookupError, TypeError, URLError) as error:
+        return error
+    return None
+
+
+def _request_batch(articles, bibcodes):
+    """
+    Request the bibtex entries for several bibcodes from ADS at once, and
+    match the entries in the response to the Articles they were requested for
+
+    An entry matches an Article if its reference starts with the requested
+    bibcode (which may be missing the author initial), or for an arXiv
+    identifier if its eprint is the same.
+
+    Parameters
+    ----------
+    articles : list of Articles
+        The Articles being resolved
+    bibcodes : list of tuples: 2 elements, (index in articles, bibcode)
+        The bibcodes to request
+
+    Returns
+    -------
+    dictionary
+        Index in articles : bibtex entry (list of strings), for the Articles
+        with an entry in the response
+    """
+    if len(bibcodes) < 2:
+        return {}
+    url = _ads_query_url(Article.ads_mirror, 'bibcode',
+                         sorted(set(bibcode for index, bibcode in bibcodes)))
+    start = time.time()
+    try:
+        page = _ads_client().get(url)
+    except URLError as error:
+        if Article.stats is not None:
+            Article.stats.failure('ads_request.batch', error)
+        # Fall back to requesting the entries one at a time
+        return {}
+    if Article.stats is not None:
+        Article.stats.add_time('ads_request.batch', time.time() - start)
+    lines = [line.decode('iso-8859-1')
+             for line in io.BytesIO(page).readlines()[5:]]
+    references = []  # (lower case reference, arXiv identifier, entry)
+    for entry_type, entry in _iter_entries(lines):
+        try:
+            bib_dict = _parse_bibtex_entry(entry)
+        except (AttributeError, IndexError, KeyError):
+            continue
+        eprint = bib_dict.get('eprint')
+        if eprint:
+            eprint = _normalise_arxiv(eprint)
+        references.append((bib_dict['reference'].lower(), eprint, entry))
+
+    entries = {}
+    for index, bibcode in bibcodes:
+        article = articles[index]
+        bibcode = bibcode.lower()
+        eprint = None
+        if article.identifier_type == 'arxiv':
+            eprint = _normalise_arxiv(article.identifier)
+        for reference, reference_eprint, entry in references:
+            if (reference.startswith(bibcode) or
+                    (eprint is not None and eprint == reference_eprint)):
+                entries[index] = entry
+                break
+    return entries
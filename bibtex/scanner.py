@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Find the identifier of an article (an ADS bibcode, arXiv identifier or DOI)
+in the file name and first page text of its pdf
+
+All of the patterns are compiled once, and the text is searched in a single
+pass for lines that could hold an identifier, so only those lines are
+examined in detail.
+"""
+
+from __future__ import unicode_literals
+import re
+
+
+# Identifier patterns, matched against lower case text
+_ABS = (r'[0-9]{4}'     # year
+        r'[a-z&]{2,6}'  # journal
+        r'\.*'          # some number of .'s
+        r'[0-9]{1,4}'   # volume
+        r'[a-z]?'       # can have 'L' etc
+        r'\.*'          # some number of .'s
+        r'[0-9]{1,4}'   # start page
+        r'[a-z]{1,2}'   # author initial
+        )
+_DOI = (r'[0-9]{2}'       # 2 digits
+        r'\.'             # .
+        r'[0-9]{4}'       # 4 digits
+        r'/'              # /
+        r'.*?'            # min num of anything
+        r'(?=[\ (\n)])'   # end at space/newline
+        )
+_ABS_RE = re.compile(_ABS)
+_DOI_RE = re.compile(_DOI)
+# Any line that could hold an identifier matches this
+_CANDIDATE_RE = re.compile('|'.join([_ABS, 'arxiv', _DOI]))
+
+# Journal names and their ADS codes
+# List so that order is preserved (for apjs)
+_JOURNALS = [['a&a', 'aap'],
+             ['asp conference series', 'aspc'],
+             ['the astronomical journal', 'aj'],
+             ['the astrophysical journal', 'apj'],
+             ['the astrophysical journal supplement', 'apjs'],
+             ['annu. rev. astron. astrophys.', 'ara&a'],
+             ['annu. rev. astro. astrophys.', 'ara&a'],
+             ['mon. not. r. astron. soc.', 'mnras'],
+             ['pasj', 'pasj'],
+             ['res. astron. astrophys.', 'raa'],
+             ['research in astron. astrophys.', 'raa']
+            ]
+_JOURNAL_RE = re.compile('|'.join(re.escape(name) for name, code in _JOURNALS))
+_YEAR_RE = re.compile(r'[0-9]{4}')
+_VOL_PAGES_RE = re.compile(r'[0-9]{1,4}'     # volume
+                           r'[:,\s]{1,4}'    # volume-pages separator
+                           r'l?'             # if a Letter
+                           r'[0-9]{1,4}'     # start page s
+                           r'([-––è]|\sy)?'  # start-end page sep
+                           r'l?'             # if a letter
+                           r'([0-9]{1,4})?'  # end page (may not exist)
+                           )
+_VOLUME_RE = re.compile(r'[0-9]{1,4}[:,\s]')
+_PAGE_RE = re.compile(r'[0-9]{1,4}')
+
+
+def identify(path, pdf_txt):
+    """
+    Find the identifier of an article
+
+    The file name and then each line of text are searched in order, and in
+    each line an ABS bibcode is preferred to an arXiv identifier, which is
+    preferred to a DOI. If none is found, an ABS bibcode is constructed from
+    the first line citing a known journal, volume, page and year.
+
+    Parameters
+    ----------
+    path : string
+        The path to the pdf
+    pdf_txt : list of strings
+        The lines of text on the first page of the pdf
+
+    Returns
+    -------
+    tuple: 2 elements, (identifier, identifier type) or None
+        identifier type can be {'doi', arxiv', 'abs'}, None if not found
+    """
+    for candidate in candidates(path, pdf_txt):
+        return candidate
+    return journal_identifier(pdf_txt)
+
+
+def candidates(path, pdf_txt):
+    """
+    Find the identifier in each line of the file name and text that has one
+
+    Parameters
+    ----------
+    path : string
+        The path to the pdf
+    pdf_txt : list of strings
+        The lines of text on the first page of the pdf
+
+    Yields
+    ------
+    tuple: 2 elements, (identifier, identifier type)
+        The identifier of each line, in order
+    """
+    candidate = _identify_line(path.lower())
+    if candidate is not None:
+        yield candidate
+    text = ''.join(pdf_txt).lower()
+    position = 0
+    while True:
+        match = _CANDIDATE_RE.search(text, position)
+        if match is None:
+            return
+        line, position = _line_at(text, match.start())
+        candidate = _identify_line(line)
+        if candidate is not None:
+            yield candidate
+
+
+def journal_identifier(pdf_txt):
+    """
+    Construct an ABS bibcode from a line citing a journal, volume, page and
+    year
+
+    Parameters
+    ----------
+    pdf_txt : list of strings
+        The lines of text on the first page of the pdf
+
+    Returns
+    -------
+    tuple: 2 elements, (identifier, 'abs') or None
+        None if no such line is found
+    """
+    text = ''.join(pdf_txt).lower()
+    position = 0
+    while True:
+        match = _JOURNAL_RE.search(text, position)
+        if match is None:
+            return None
+        line, position = _line_at(text, match.start())
+        # Look for a single line with a journal name and year
+        if not _YEAR_RE.search(line):
+            continue
+        codes = [code for name, code in _JOURNALS if name in line]
+        # Volume and first page
+        vol_pages = _VOL_PAGES_RE.search(line)
+        if vol_pages is None:
+            continue
+        vol_pages = vol_pages.group()
+        volume = _VOLUME_RE.search(vol_pages).group()[:-1]
+        pages = re.sub(volume, '', vol_pages)
+        qualifier = '.'
+        if 'l' in pages:
+            qualifier = 'l'
+        page = _PAGE_RE.search(pages).group()
+
+        # Year
+        year_line = re.sub(codes[0], '', line)
+        year_line = re.sub(vol_pages, '', year_line)
+        year = _YEAR_RE.search(year_line)
+        if year is None:
+            continue
+
+        # Construct bibcode from parts derived above
+        journal = codes[-1]
+        return ''.join([year.group(), journal,
+                        '.' * (9 - len(journal) - len(volume)),
+                        volume, qualifier,
+                        '.' * (4 - len(page)), page]), 'abs'
+
+
+def _identify_line(line):
+    """
+    Find the identifier in a single lower case line
+
+    Returns
+    -------
+    tuple: 2 elements, (identifier, identifier type) or None
+    """
+    # abs bibcode
+    match = _ABS_RE.search(line)
+    if match is not None:
+        return match.group()[:-1], 'abs'
+    # arxiv bibcode, only at the start of a line eg the arXiv stamp
+    position = line.find('arxiv')
+    if position >= 0:
+        words = line.split()
+        if line[position + 5:position + 6] == ')' or words[0][:5] != 'arxiv':
+            return None
+        eprint = words[0][6:]
+        if eprint[-2:-1] == 'v':
+            eprint = eprint[:-2]
+        if not eprint:
+            return None
+        return eprint, 'arxiv'
+    # doi
+    match = _DOI_RE.search(line)
+    if match is not None:
+        return match.group(), 'doi'
+    return None
+
+
+def _line_at(text, position):
+    """
+    Get the line of text containing a position, and the position of the start
+    of the next line
+    """
+    start = text.rfind('\n', 0, position) + 1
+    end = text.find('\n', position) + 1
+    if end == 0:
+        end = len(text)
+    return text[start:end], end
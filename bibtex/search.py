@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Search the entries of a bibtex file by author, title, journal and year
+
+Words are indexed after converting LaTeX to text, removing accents and
+lowering the case, so 'Ivezi{\\'c}' is found by 'ivezic' or 'Ivezić'.
+A query is a list of terms, all of which an entry must match:
+
+    Ivezic                  any author, title or journal word
+    author:Ivezi*           an author surname starting with 'ivezi'
+    title:"dark matter"     title words (each must be in the title)
+    journal:ApJ             journal words
+    year:2005  year:2005-2010  year:2005-  year:-2010
+
+A trailing '*' makes any word a prefix.
+"""
+
+from __future__ import unicode_literals
+import bisect, marshal, re, unicodedata
+
+from bibtex.entry import _latex_to_text
+
+
+# Changed whenever the saved index changes form, invalidating saved indexes
+_FORMAT = 1
+# The fields of a query : the prefix of the words of that field in the index
+_FIELDS = {'author': 'a:', 'title': 't:', 'journal': 'j:'}
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+# A year or range of years eg '2005', '2005-2010', '2005-', '-2010'
+_YEARS_RE = re.compile(r'^(\d*)(-?)(\d*)$')
+# A term of a query, eg 'author:Ivezi*', 'title:"dark matter"' or 'dust'
+_TERM_RE = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))', re.UNICODE)
+
+
+class SearchIndex(object):
+
+    def __init__(self, articles=()):
+        """
+        An inverted index of the words of the authors (surnames), titles and
+        journals of Articles, with the year of each
+
+        Words are kept in a sorted table as well, so that prefix queries
+        find the words with a prefix by bisection.
+
+        Parameters
+        ----------
+        articles : iterable of Articles, optional
+            The Articles to index (default: none)
+        """
+        self.references = []  # Reference of each Article, by id
+        self._years = []  # Year of each Article (None if unknown), by id
+        self._postings = {}  # Prefixed word : ids of the Articles with it
+        self._words = None  # Sorted prefixed words, built when first needed
+        for article in articles:
+            self.add(article)
+
+
+    def __len__(self):
+        """
+        Returns the number of Articles indexed
+        """
+        return len(self.references)
+
+
+    def add(self, article):
+        """
+        Add an Article to the index
+
+        Parameters
+        ----------
+        article : Article or LazyArticle
+            The Article to add
+        """
+        article_id = len(self.references)
+        self.references.append(article.reference)
+        self._years.append(_year(article.year))
+        words = set()
+        for author in article.authors:
+            words.update('a:' + word for word in _words(author[0]))
+        words.update('t:' + word for word in _words(article.title))
+        words.update('j:' + word for word in _words(article.journal))
+        for word in words:
+            postings = self._postings.get(word)
+            if postings is None:
+                self._postings[word] = [article_id]
+                if self._words is not None:
+                    bisect.insort(self._words, word)
+            else:
+                postings.append(article_id)
+
+
+    def search(self, query):
+        """
+        Find the Articles that match a query
+
+        Parameters
+        ----------
+        query : string
+            The query, eg 'author:Ivezi* year:2005-2010' (see the module
+            documentation)
+
+        Returns
+        -------
+        list of strings
+            The references of the Articles that match, in the order they were
+            added
+        """
+        if isinstance(query, bytes):  # Command line arguments in Python 2
+            query = query.decode('utf-8')
+        matches = None  # Set of ids, None = every Article
+        years = None
+        for field, quoted, value in _TERM_RE.findall(query):
+            value = quoted or value
+            field = field.lower()
+            if field == 'year':
+                years = _year_range(value)
+                continue
+            if field and field not in _FIELDS:
+                raise ValueError('Unknown field {0}, not one of {1}'.format(
+                                    field, ', '.join(sorted(_FIELDS) +
+                                                     ['year'])))
+            prefixes = [_FIELDS[field]] if field else sorted(_FIELDS.values())
+            prefix_query = value.endswith('*')
+            words = _words(value)
+            for index, word in enumerate(words):
+                # Only the last word of a term is a prefix
+                ids = self._ids(prefixes, word,
+                                prefix_query and index == len(words) - 1)
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+        if matches is None:
+            if years is None:
+                return []
+            matches = range(len(self.references))
+        if years is not None:
+            first, last = years
+            matches = [article_id for article_id in matches
+                       if self._years[article_id] is not None and
+                       first <= self._years[article_id] <= last]
+        return [self.references[article_id] for article_id in sorted(matches)]
+
+
+    def save(self, path, signature):
+        """
+        Write the index to a file
+
+        Parameters
+        ----------
+        path : string
+            The path to the file
+        signature : object
+            What the index is valid for eg the (size, modification time) of
+            the bibtex file, checked when it is loaded
+        """
+        with open(path, 'wb') as index_file:
+            marshal.dump((_FORMAT, signature, self.references, self._years,
+                          self._postings), index_file)
+
+
+    @classmethod
+    def load(cls, path, signature):
+        """
+        Read an index written by save
+
+        Parameters
+        ----------
+        path : string
+            The path to the file
+        signature : object
+            What the index must be valid for, as given to save
+
+        Returns
+        -------
+        SearchIndex or None
+            The index, or None if there is no valid index in the file
+        """
+        try:
+            with open(path, 'rb') as index_file:
+                saved = marshal.loads(index_file.read())
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if (saved[0] != _FORMAT or
+                tuple(saved[1]) != tuple(signature)):
+            return None
+        index = cls()
+        index.references, index._years, index._postings = saved[2:]
+        return index
+
+
+    def _ids(self, prefixes, word, prefix_query):
+        """
+        Get the ids of the Articles with a word in any of some fields, or a
+        word starting with it for a prefix query
+        """
+        ids = set()
+        for prefix in prefixes:
+            if not prefix_query:
+                ids.update(self._postings.get(prefix + word, ()))
+                continue
+            if self._words is None:
+                self._words = sorted(self._postings)
+            position = bisect.bisect_left(self._words, prefix + word)
+            while (position < len(self._words) and
+                   self._words[position].startswith(prefix + word)):
+                ids.update(self._postings[self._words[position]])
+                position += 1
+        return ids
+
+
+def _words(text):
+    """
+    Split text into words, converting LaTeX to text, removing accents and
+    lowering the case
+    """
+    text = unicodedata.normalize('NFKD', _latex_to_text(text).lower())
+    return _WORD_RE.findall(''.join(character for character in text
+                                    if not unicodedata.combining(character)))
+
+
+def _year(year):
+    """
+    Get a year as an int, or None if it is not a number
+    """
+    try:
+        return int(year)
+    except (TypeError, ValueError):
+        return None
+
+
+def _year_range(value):
+    """
+    Get the (first, last) years of a year or range of years eg '2005-2010'
+    """
+    found = _YEARS_RE.match(value)
+    if found is None or not (found.group(1) or found.group(3)):
+        raise ValueError('{0} is not a year or range of years'.format(value))
+    first, dash, last = found.groups()
+    if not dash:
+        last = first
+    return int(first or 0), int(last or 9999)
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Answer citation lookups from a bibtex file kept in memory, over a Unix socket
+
+Requests and responses are JSON objects, one to a line. Each request has an
+'op' and its arguments:
+
+    {"op": "get", "reference": "2012ApJ...745....1S"}
+    {"op": "doi", "doi": "10.1088/0004-637X/745/1/1"}
+    {"op": "arxiv", "eprint": "1201.4773"}
+    {"op": "resolve", "keys": ["2012ApJ...745....1S", ...]}
+    {"op": "complete", "prefix": "2012ApJ", "limit": 20}
+    {"op": "export", "document": "/path/paper.aux", "output": "/path/paper.cited.bib"}
+    {"op": "ping"}
+
+and each response has 'ok', and either the result or an 'error'. Entries are
+returned as the text written to a bibtex file. An export is only written to a
+.bib file, and never to the file being served. The file is read again when
+its size or modification time changes. If it cannot be parsed, the entries
+read before are kept, and the error is reported by 'ping'.
+"""
+
+from __future__ import unicode_literals
+import bisect, json, os, socket, threading, time
+try:
+    from socketserver import StreamRequestHandler, ThreadingMixIn, \
+                             UnixStreamServer
+except ImportError:
+    from SocketServer import StreamRequestHandler, ThreadingMixIn, \
+                             UnixStreamServer
+
+from bibtex.bibtexfile import (BibtexFile, _file_signature, _format_entry,
+                               _sort_key, _write_atomically)
+from bibtex.citations import iter_citations
+from bibtex.client import CitationClient, default_socket_path
+
+
+# The ops a CitationServer answers
+_OPS = ('get', 'doi', 'arxiv', 'resolve', 'complete', 'export', 'ping')
+
+
+class CitationServer(ThreadingMixIn, UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, bib_path, socket_path=None):
+        """
+        A server answering lookups in a bibtex file, which is read once and
+        read again only when it changes
+
+        Parameters
+        ----------
+        bib_path : string
+            The path to the bibtex file
+        socket_path : string, optional
+            The path to the Unix socket to listen on (default: None =
+            bib_path with '.sock' appended). A socket left by a server that
+            has stopped is replaced.
+        """
+        self.bib_path = bib_path
+        if socket_path is None:
+            socket_path = default_socket_path(bib_path)
+        self.socket_path = socket_path
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._load()
+        if os.path.exists(socket_path):
+            client = CitationClient(socket_path)
+            try:
+                client.request('ping')
+            except socket.error:  # Left by a server that has stopped
+                os.remove(socket_path)
+            else:
+                raise IOError('A server is already listening on {0}'.format(
+                                                                socket_path))
+            finally:
+                client.close()
+        UnixStreamServer.__init__(self, socket_path, _Handler)
+
+
+    @property
+    def bib_file(self):
+        """
+        The BibtexFile being served
+        """
+        return self._served[0]
+
+
+    def server_close(self):
+        """
+        Stop listening, and remove the socket
+        """
+        UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+    def answer(self, request):
+        """
+        Answer a request
+
+        Parameters
+        ----------
+        request : dictionary
+            The request, with an 'op' and its arguments
+
+        Returns
+        -------
+        dictionary
+            The response, with 'ok' and either the result or an 'error'
+        """
+        with self._requests_lock:
+            self.requests += 1
+        try:
+            self._check_file()
+            op = request.get('op')
+            if op not in _OPS:
+                raise ValueError('Unknown op {0}'.format(op))
+            response = getattr(self, '_' + op)(request)
+        except (KeyError, TypeError, ValueError, IOError, OSError) as error:
+            return {'ok': False, 'error': '{0}: {1}'.format(
+                                            type(error).__name__, error)}
+        response['ok'] = True
+        return response
+
+
+    def _get(self, request):
+        """
+        Get the entry with a reference
+        """
+        return {'entry': _format_entry(
+                                self.bib_file.get(request['reference']))}
+
+
+    def _doi(self, request):
+        """
+        Get the entry with a DOI
+        """
+        return {'entry': _format_entry(
+                                self.bib_file.get_by_doi(request['doi']))}
+
+
+    def _arxiv(self, request):
+        """
+        Get the entry with an arXiv identifier
+        """
+        return {'entry': _format_entry(
+                            self.bib_file.get_by_arxiv(request['eprint']))}
+
+
+    def _resolve(self, request):
+        """
+        Get the entries of several references, and the references not found
+        """
+        bib_file = self.bib_file
+        entries = {}
+        missing = []
+        for key in request['keys']:
+            try:
+                entries[key] = _format_entry(bib_file.get(key))
+            except ValueError:
+                missing.append(key)
+        return {'entries': entries, 'missing': missing}
+
+
+    def _complete(self, request):
+        """
+        Get the references that start with a prefix, in order
+        """
+        prefix = request['prefix']
+        limit = request.get('limit', 20)
+        sorted_references = self._served[1]
+        start = bisect.bisect_left(sorted_references, prefix)
+        references = []
+        for reference in sorted_references[start:start + limit]:
+            if not reference.startswith(prefix):
+                break
+            references.append(reference)
+        return {'references': references}
+
+
+    def _export(self, request):
+        """
+        Write the entries cited by a document to a bibtex file, as mnbib does
+        """
+        output_path = request['output']
+        # Any client can ask for an export, so only write .bib files
+        if not output_path.endswith('.bib'):
+            raise ValueError('Not writing {0}, which is not a .bib file'
+                             .format(output_path))
+        if os.path.lexists(output_path) and not os.path.isfile(output_path):
+            raise ValueError('Not overwriting {0}, which is not a file'
+                             .format(output_path))
+        if os.path.realpath(output_path) == os.path.realpath(self.bib_path):
+            raise ValueError('Not overwriting {0}'.format(self.bib_path))
+        bib_file = self.bib_file
+        articles = []
+        missing = []
+        for reference in iter_citations(request['document']):
+            try:
+                articles.append(bib_file.get(reference))
+            except ValueError:
+                missing.append(reference)
+        articles.sort(key=_sort_key)
+        written = _write_atomically(output_path, (_export_entry(article)
+                                                  for article in articles))
+        return {'entries': len(articles), 'bytes': written,
+                'missing': missing}
+
+
+    def _ping(self, request):
+        """
+        Describe the file being served
+        """
+        return {'path': self.bib_path, 'entries': len(self._served[1]),
+                'loaded': self.loaded, 'load_error': self.load_error,
+                'requests': self.requests}
+
+
+    def _check_file(self):
+        """
+        Read the file again if it has changed since it was read
+        """
+        if _file_signature(self.bib_path) != self._signature:
+            with self._reload_lock:
+                signature = _file_signature(self.bib_path)
+                if signature != self._signature:
+                    try:
+                        self._load()
+                    except (AttributeError, IndexError, KeyError,
+                            TypeError, ValueError) as error:
+                        # Keep answering from the file as it was, until it
+                        # changes again
+                        self._signature = signature
+                        self.load_error = '{0}: {1}'.format(
+                                                type(error).__name__, error)
+
+
+    def _load(self):
+        """
+        Read the file, and build the indexes of references, DOIs and arXiv
+        identifiers
+        """
+        signature = _file_signature(self.bib_path)
+        bib_file = BibtexFile(self.bib_path)
+        bib_file._build_identifier_indexes()
+        # Replaced together, so a request never sees one of a new file with
+        # the other of the old
+        self._served = (bib_file, sorted(article.reference
+                                         for article in bib_file.articles))
+        self._signature = signature
+        self.loaded = time.time()
+        self.load_error = None
+
+
+class _Handler(StreamRequestHandler):
+
+    def handle(self):
+        """
+        Answer each line of JSON read until the client closes the connection
+        """
+        for line in iter(self.rfile.readline, b''):
+            try:
+                request = json.loads(line.decode('utf-8'))
+                if not isinstance(request, dict):
+                    raise ValueError('Request is not an object')
+                response = self.server.answer(request)
+            except ValueError as error:
+                response = {'ok': False,
+                            'error': 'Bad request: {0}'.format(error)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _ExportedArticle(object):
+
+    def __init__(self, article, bibtex):
+        """
+        The fields of an Article to format with _format_entry, with its own
+        copy of the bibtex dictionary so the Article is not changed
+        """
+        self.type = article.type
+        self.reference = article.reference
+        self.authors = article.authors
+        self.bibtex = bibtex
+
+
+def _export_entry(article):
+    """
+    Format the entry of an Article for a file of the entries cited by a
+    document, with the arXiv identifier of a preprint as its journal
+    """
+    if article.journal == 'arXiv' and 'eprint' in article.bibtex:
+        bibtex = dict(article.bibtex)
+        bibtex['journal'] = 'arXiv:' + bibtex['eprint']
+        return _format_entry(_ExportedArticle(article, bibtex))
+    return _format_entry(article)
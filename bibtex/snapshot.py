@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Keep the parsed entries of a bibtex file in a snapshot (in marshal format), so
+that the file can be imported again without being parsed while it is unchanged
+
+A snapshot is valid while the size and SHA-1 hash of the file are the same as
+when it was taken. Snapshots are not taken unless a directory to keep them in
+is given, and the least recently used are removed to bound its size.
+"""
+
+from __future__ import unicode_literals
+import hashlib, marshal, os, sys
+
+
+# Changed whenever the parsed entries or the header change form, invalidating
+# old snapshots
+_FORMAT = 2
+
+
+def snapshot_path(directory, bib_path):
+    """
+    Get the path to the snapshot of a bibtex file
+
+    Parameters
+    ----------
+    directory : string
+        The directory snapshots are kept in
+    bib_path : string
+        The path to the bibtex file
+
+    Returns
+    -------
+    string
+        The path to the snapshot, named by a hash of the absolute path of the
+        file and the Python version (as marshal formats differ between them)
+    """
+    name = hashlib.sha1(os.path.abspath(bib_path).encode('utf-8')).hexdigest()
+    return os.path.join(directory, '{0}-py{1}{2}.marshal'.format(
+                                            name, *sys.version_info[:2]))
+
+
+def file_hash(bib_path):
+    """
+    Get the SHA-1 hash of a file, read in blocks so that it is not read into
+    memory at once (used for pdfs as well as bibtex files)
+    """
+    sha1 = hashlib.sha1()
+    with open(bib_path, 'rb') as bib_file:
+        for block in iter(lambda: bib_file.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def load_snapshot(path, bib_path):
+    """
+    Load the parsed entries of a bibtex file from a snapshot
+
+    The file is only hashed if its modification time has changed since the
+    snapshot was taken.
+
+    Parameters
+    ----------
+    path : string
+        The path to the snapshot
+    bib_path : string
+        The path to the bibtex file
+
+    Returns
+    -------
+    list of dictionaries or None
+        The entries as parsed by _parse_bibtex_entry, or None if there is no
+        valid snapshot
+    """
+    try:
+        with open(path, 'rb') as snapshot:
+            # marshal.load makes many small reads of a file, so read it whole
+            header, entries = marshal.loads(snapshot.read())
+        stat = os.stat(bib_path)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    if len(header) != 4 or header[0] != _FORMAT:
+        return None
+    size, mtime, sha1 = header[1:]
+    if stat.st_size != size:
+        return None
+    try:
+        if stat.st_mtime == mtime:
+            os.utime(path, None)  # Recently used, so kept by prune_snapshots
+        elif file_hash(bib_path) == sha1:
+            # Only touched, record the new time so it is not hashed again
+            _write_snapshot(path, (_FORMAT, size, stat.st_mtime, sha1),
+                            entries)
+        else:
+            return None
+    except (IOError, OSError):
+        pass
+    return entries
+
+
+def save_snapshot(path, bib_path, entries):
+    """
+    Save the parsed entries of a bibtex file to a snapshot, replacing any
+    previous snapshot atomically
+
+    Nothing is saved if the file changes while it is hashed.
+
+    Parameters
+    ----------
+    path : string
+        The path to the snapshot
+    bib_path : string
+        The path to the bibtex file
+    entries : list of dictionaries
+        The entries as parsed by _parse_bibtex_entry
+    """
+    before = os.stat(bib_path)
+    sha1 = file_hash(bib_path)
+    after = os.stat(bib_path)
+    if (before.st_size, before.st_mtime) != (after.st_size, after.st_mtime):
+        return
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    _write_snapshot(path, (_FORMAT, after.st_size, after.st_mtime, sha1),
+                    entries)
+
+
+def _write_snapshot(path, header, entries):
+    """
+    Write a snapshot to a temporary file which then replaces any previous one
+    """
+    temporary_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as snapshot:
+        snapshot.write(marshal.dumps((header, entries)))
+    os.rename(temporary_path, path)
+
+
+def prune_snapshots(directory, max_bytes):
+    """
+    Remove the least recently used snapshots in a directory until those left
+    take at most max_bytes, always keeping the most recently used
+
+    Parameters
+    ----------
+    directory : string
+        The directory snapshots are kept in
+    max_bytes : int
+        The most bytes of snapshots to keep
+    """
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith('.marshal'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:  # Removed by another process
+            continue
+        snapshots.append((stat.st_mtime, stat.st_size, path))
+    snapshots.sort(reverse=True)
+    total = 0
+    for index, (mtime, size, path) in enumerate(snapshots):
+        total += size
+        if total > max_bytes and index > 0:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Timers, counters and failure reasons for the stages of processing pdfs and
+bibtex files, reported as JSON
+"""
+
+from __future__ import unicode_literals
+import json, math, sys, threading, time
+from contextlib import contextmanager
+
+
+class Stats(object):
+
+    def __init__(self):
+        """
+        Timings of stages (eg 'pdftotext', 'ads_request.doi'), counters and
+        failures by exception class, which can be shared between threads
+        """
+        self.timings = {}  # stage : list of times in seconds
+        self.counters = {}
+        self.failures = {}  # stage : {exception class name : count}
+        self._lock = threading.Lock()
+
+
+    def add_time(self, stage, seconds):
+        """
+        Record the time taken by a stage once
+
+        Parameters
+        ----------
+        stage : string
+            The name of the stage
+        seconds : float
+            The time taken in seconds
+        """
+        with self._lock:
+            self.timings.setdefault(stage, []).append(seconds)
+
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Time the body of a with statement as a stage, if it does not raise an
+        exception
+
+        Parameters
+        ----------
+        stage : string
+            The name of the stage
+        """
+        start = time.time()
+        yield
+        self.add_time(stage, time.time() - start)
+
+
+    def count(self, counter, number=1):
+        """
+        Add to a counter
+
+        Parameters
+        ----------
+        counter : string
+            The name of the counter
+        number : int, optional
+            The number to add (default: 1)
+        """
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + number
+
+
+    def failure(self, stage, error):
+        """
+        Record a stage failing with an exception
+
+        Parameters
+        ----------
+        stage : string
+            The name of the stage
+        error : exception
+            The exception raised
+        """
+        name = type(error).__name__
+        with self._lock:
+            failures = self.failures.setdefault(stage, {})
+            failures[name] = failures.get(name, 0) + 1
+
+
+    def report(self):
+        """
+        Summarise the timings of each stage, with the counters and failures
+
+        Returns
+        -------
+        dictionary
+            'stages': {stage: {'count', 'total', 'mean', 'p50', 'p95', 'max'}}
+            with times in seconds, 'counters' and 'failures'
+        """
+        with self._lock:
+            stages = {}
+            for stage, timings in self.timings.items():
+                timings = sorted(timings)
+                total = sum(timings)
+                stages[stage] = {'count': len(timings),
+                                 'total': total,
+                                 'mean': total / len(timings),
+                                 'p50': _percentile(timings, 50),
+                                 'p95': _percentile(timings, 95),
+                                 'max': timings[-1]}
+            return {'stages': stages,
+                    'counters': dict(self.counters),
+                    'failures': dict((stage, dict(failures)) for
+                                     stage, failures in self.failures.items())}
+
+
+    def write(self, path):
+        """
+        Write the report as JSON
+
+        Parameters
+        ----------
+        path : string
+            The file to write to, or '-' for standard output
+        """
+        report = json.dumps(self.report(), indent=1, sort_keys=True)
+        if path == '-':
+            print(report)
+        else:
+            with open(path, 'w') as report_file:
+                report_file.write(report + '\n')
+
+
+def profile(path, function, *args, **kwargs):
+    """
+    Call a function under cProfile, writing the profile to a file that can be
+    read with pstats
+
+    Only the calling process is profiled, not any worker processes.
+
+    Parameters
+    ----------
+    path : string
+        The file to write the profile to
+    function : function
+        The function to call, with any other arguments
+
+    Returns
+    -------
+    object
+        The value returned by function
+    """
+    # Only imported when profiling, as the tools import this module
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)
+        sys.stderr.write('Wrote a profile to {0}, read it with python -m'
+                         ' pstats {0}\n'.format(path))
+
+
+def _percentile(timings, percent):
+    """
+    Get a percentile of sorted timings, by the nearest rank
+    """
+    rank = int(math.ceil(percent / 100. * len(timings)))
+    return timings[max(rank, 1) - 1]
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Watch a directory for new or changed pdfs, with inotify on Linux and by
+polling elsewhere
+"""
+
+from __future__ import unicode_literals
+import ctypes, ctypes.util, errno, fnmatch, os, select, struct, sys, time
+
+
+# inotify events of a file being written or moved into the directory
+_IN_MODIFY = 0x2
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+# The event queue overflowed, so events were lost
+_IN_Q_OVERFLOW = 0x4000
+_IN_NONBLOCK = os.O_NONBLOCK
+# struct inotify_event, followed by a name of len bytes
+_EVENT = struct.Struct(str('iIII'))
+
+
+class PdfWatcher(object):
+
+    def __init__(self, directory, settle=2., poll_interval=2.,
+                 pattern='*.pdf'):
+        """
+        Watch a directory for new or changed pdfs, reporting each once it has
+        settled (its size and modification time have not changed for settle
+        seconds), so that partly downloaded or copied pdfs are not reported
+
+        The pdfs already in the directory are not reported unless they change.
+        inotify is used where it is available (Linux), otherwise the
+        directory is listed every poll_interval seconds.
+
+        Parameters
+        ----------
+        directory : string
+            The directory to watch
+        settle : float, optional
+            The time a pdf must be unchanged for, in seconds (default: 2)
+        poll_interval : float, optional
+            The time between listing the directory when inotify is not
+            available, in seconds (default: 2)
+        pattern : string, optional
+            The pattern of the names of files to watch (default: '*.pdf')
+        """
+        self.directory = directory
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.pattern = pattern
+        # pdf path : (size, modification time) when it was last reported
+        self._seen = {}
+        # pdf path : (size, modification time, time it was first seen so)
+        self.pending = {}
+        self._fd = _inotify_watch(directory)
+        for path in self._list():
+            self.ignore(path)
+
+
+    @property
+    def inotify(self):
+        """
+        Whether the directory is watched with inotify, rather than polled
+        """
+        return self._fd is not None
+
+
+    def ignore(self, path):
+        """
+        Do not report a pdf unless it changes, eg as it has been processed or
+        renamed
+        """
+        self.pending.pop(path, None)
+        try:
+            self._seen[path] = _signature(path)
+        except OSError:
+            pass
+
+
+    def wait(self, timeout=None):
+        """
+        Wait for pdfs to be added or changed, and settle
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The longest time to wait, in seconds (default: None = until a pdf
+            settles)
+
+        Returns
+        -------
+        list of strings
+            The paths to the pdfs that have settled, sorted, or [] if none did
+            before timeout
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            settled = self._settled(now)
+            if settled:
+                return settled
+            if deadline is not None and now >= deadline:
+                return []
+            # Wake up to check pending pdfs, and to poll without inotify
+            wait = None
+            if self.pending:
+                wait = self.settle / 2.
+            if self._fd is None:
+                wait = min(wait or self.poll_interval, self.poll_interval)
+            if deadline is not None:
+                wait = min(wait if wait is not None else deadline - now,
+                           deadline - now)
+            if self._fd is None:
+                time.sleep(wait)
+                for path in self._list():
+                    self._observe(path)
+            else:
+                for path in self._read_events(wait):
+                    self._observe(path)
+
+
+    def close(self):
+        """
+        Stop watching the directory
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+    def _list(self):
+        """
+        List the pdfs in the directory
+        """
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if fnmatch.fnmatch(name, self.pattern)]
+
+
+    def _observe(self, path):
+        """
+        Add a pdf to the pending pdfs if it is new or has changed
+        """
+        try:
+            signature = _signature(path)
+        except OSError:  # Removed or renamed since
+            return
+        if self._seen.get(path) != signature and path not in self.pending:
+            self.pending[path] = signature + (time.time(),)
+
+
+    def _settled(self, now):
+        """
+        Remove and return the pending pdfs that have not changed for settle
+        seconds
+        """
+        settled = []
+        for path, (size, mtime, since) in list(self.pending.items()):
+            try:
+                signature = _signature(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if signature != (size, mtime):
+                self.pending[path] = signature + (now,)
+            elif now - since >= self.settle and size > 0:
+                del self.pending[path]
+                self._seen[path] = signature
+                settled.append(path)
+        return sorted(settled)
+
+
+    def _read_events(self, timeout):
+        """
+        Wait for inotify events, returning the paths to the pdfs they are for
+        """
+        try:
+            readable = select.select([self._fd], [], [], timeout)[0]
+        except select.error as error:
+            if error.args[0] == errno.EINTR:
+                return []
+            raise
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as error:
+            if error.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return self._list()
+            name = name.decode(sys.getfilesystemencoding())
+            if fnmatch.fnmatch(name, self.pattern):
+                paths.append(os.path.join(self.directory, name))
+        return paths
+
+
+def _inotify_watch(directory):
+    """
+    Watch a directory with inotify, if it is available
+
+    Returns
+    -------
+    int or None
+        The inotify file descriptor, or None if inotify is not available
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK)
+    except (AttributeError, OSError):
+        return None
+    if fd < 0:
+        return None
+    mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+    if libc.inotify_add_watch(fd, os.path.abspath(directory).encode(
+                                            sys.getfilesystemencoding()),
+                              mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _signature(path):
+    """
+    Get the size and modification time of a file
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
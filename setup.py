@@ -11,5 +11,6 @@ setup(
     author_email='rdg@roe.ac.uk',
     url='',
     packages=['bibtex'],
-    scripts=['bin/pdftobib', 'bin/mnbib'],
+    scripts=['bin/pdftobib', 'bin/mnbib', 'bin/bibmerge', 'bin/bibserve',
+             'bin/bibquery', 'bin/bibsearch'],
 )